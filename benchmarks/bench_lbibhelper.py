@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+"""Benchmarks for lbibhelper on synthetic LBIBCell output.
+
+The checkout the script lives in is benchmarked, no install needed.
+Results are written as JSON so runs of different versions can be
+compared::
+
+    python benchmarks/bench_lbibhelper.py --scales small medium -o bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# benchmark this checkout, not whatever lbibhelper is installed
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import lbibhelper  # noqa: E402
+from lbibhelper.core.settings import default_num_threads  # noqa: E402
+from lbibhelper.core.synthetic import write_synthetic_run  # noqa: E402
+from lbibhelper.fit.solver import fit_exp  # noqa: E402
+from lbibhelper.report_processor import SolverProcessor  # noqa: E402
+from lbibhelper.report_processor.parser import parse_solver_txt  # noqa: E402
+from lbibhelper.report_processor.solver_processor import get_solver_mat  # noqa: E402
+
+# (size_x, size_y, n_steps)
+SCALES = {
+    "small": (100, 30, 10),
+    "medium": (500, 150, 20),
+    "large": (1000, 300, 50),
+}
+
+# frames rendered per scale, plotting the whole run takes too long
+N_PLOT = 5
+
+
+def _timeit(func, repeat=1):
+    # best of `repeat` wall times
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# modules a plain `import lbibhelper` must not pull in
+HEAVY_MODULES = ["matplotlib", "scipy", "mpl_toolkits"]
+
+
+def bench_import(repeat=5):
+    # fresh interpreter per run, best wall time and heavy modules loaded
+    code = (
+        "import sys, time; t = time.perf_counter(); import lbibhelper; "
+        "print(time.perf_counter() - t); "
+        "print(','.join(m for m in {!r} if m in sys.modules))".format(HEAVY_MODULES)
+    )
+    best = float("inf")
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, "-c", code], cwd=ROOT, universal_newlines=True
+        )
+        lines = out.splitlines()
+        best = min(best, float(lines[0]))
+        heavy = lines[1] if len(lines) > 1 else ""
+
+    return {"seconds": best, "heavy_modules": [m for m in heavy.split(",") if m]}
+
+
+def bench_scale(directory, size_x, size_y, n_steps, jobs, sparsity):
+    files = write_synthetic_run(directory, size_x, size_y, n_steps, sparsity=sparsity)
+    n_bytes = sum(os.path.getsize(f) for f in files)
+    res = {}
+
+    res["parse"] = _timeit(lambda: parse_solver_txt(files[-1], size_x, size_y), 3)
+
+    proc = SolverProcessor(directory, verbose=False)
+    res["save_npy"] = _timeit(lambda: proc.save_npy(jobs=jobs))
+    res["save_npy_serial"] = _timeit(lambda: proc.save_npy(jobs=1))
+    res["get_solver_mat"] = _timeit(lambda: get_solver_mat(files[-1]), 3)
+
+    # render only a few frames
+    for f in files[N_PLOT:]:
+        shutil.move(f, f + ".skip")
+    proc = SolverProcessor(directory, verbose=False)
+    res["plot_solver"] = _timeit(lambda: proc.plot_solver(jobs=jobs))
+    res["plot_solver_raster"] = _timeit(
+        lambda: proc.plot_solver(jobs=jobs, raster=True)
+    )
+    res["png_to_gif"] = _timeit(lambda: proc.png_to_gif())
+    res["process"] = _timeit(lambda: proc.process(jobs=jobs))
+    for f in files[N_PLOT:]:
+        shutil.move(f + ".skip", f)
+
+    y = get_solver_mat(files[-1], flatten=True)
+    x = np.arange(y.size, dtype=float)
+    res["fit_exp"] = _timeit(lambda: fit_exp(x, y), 3)
+
+    return {
+        "grid": [size_x, size_y],
+        "n_steps": n_steps,
+        "n_plot": min(N_PLOT, n_steps),
+        "bytes": n_bytes,
+        "seconds": res,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", default=["small"], choices=SCALES)
+    parser.add_argument("--jobs", type=int, default=default_num_threads)
+    parser.add_argument("--sparsity", type=float, default=0.5)
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    results = {
+        "version": lbibhelper.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "jobs": args.jobs,
+        "sparsity": args.sparsity,
+        "import": bench_import(),
+        "scales": {},
+    }
+    for scale in args.scales:
+        directory = tempfile.mkdtemp(prefix="lbibhelper_bench_")
+        try:
+            size_x, size_y, n_steps = SCALES[scale]
+            results["scales"][scale] = bench_scale(
+                directory, size_x, size_y, n_steps, args.jobs, args.sparsity
+            )
+        finally:
+            shutil.rmtree(directory)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+
+    print("import lbibhelper {:10.4f} s".format(results["import"]["seconds"]))
+    for scale, res in results["scales"].items():
+        print(scale)
+        for name, seconds in res["seconds"].items():
+            print("  {:<16s} {:10.4f} s".format(name, seconds))
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
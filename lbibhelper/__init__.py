@@ -1,6 +1,7 @@
 """Top-level package for lbibhelper."""
 
 from .core import *
+from .core.util import lazy_attributes as _lazy_attributes
 from .fit import *
 from .report_processor import *
 
@@ -8,3 +9,12 @@ __all__ = ["core", "fit", "report_processor"]
 __author__ = """Yongqi Wang"""
 __email__ = "wangyq977@gmail.com"
 __version__ = "0.1.1"
+
+# scipy and matplotlib are only imported on first use, see lbibhelper.fit
+_lazy_attributes(
+    __name__,
+    {
+        "curve_fit": lambda: fit.curve_fit,
+        "plt": lambda: fit.plt,
+    },
+)
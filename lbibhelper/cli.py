@@ -1,16 +1,328 @@
 """Console script for lbibhelper."""
 import argparse
+import cProfile
+import csv
+import pstats
 import sys
 
+import numpy as np
+from lbibhelper.core.instrument import RunReport, print_progress
+from lbibhelper.core.settings import default_num_threads
+from lbibhelper.fit import fit_exp_batch
+from lbibhelper.report_processor import SolverProcessor, SweepProcessor
+from lbibhelper.report_processor.sweep import TABLE_COLUMNS
+from lbibhelper.report_processor.render import PREVIEW_SIZE
 
-def main():
+
+def _print_summary(report):
+    print(
+        "{:<10s} {:>10s} {:>10s} {:>12s}".format(
+            "stage", "time (s)", "items", "items/s"
+        )
+    )
+    for name, stage in report.stages.items():
+        elapsed = stage.elapsed
+        rate = stage.count / elapsed if elapsed > 0 else float("inf")
+        print(
+            "{:<10s} {:>10.3f} {:>10d} {:>12.2f}  {:s}".format(
+                name, elapsed, stage.count, rate, stage.unit
+            )
+        )
+
+    peak = report.to_dict()["peak_memory"]
+    if peak is not None:
+        print("peak memory {:.1f} MiB".format(peak / 2**20))
+
+
+def _convert(proc, args):
+    proc.save_npy(
+        jobs=args.jobs,
+        store=args.store,
+        only_changed=args.only_changed,
+        hash=args.hash,
+        steps=args.steps,
+        sparse=args.sparse,
+    )
+
+
+def _stats(proc, args):
+    with proc.report.stage("stats", "timesteps") as stage:
+        if not proc.stats:
+            proc.save_npy(jobs=args.jobs, only_changed=True)
+        names = [f.rsplit(".", 1)[0] for f in proc.select(args.steps)]
+        names = [name for name in names if name in proc.stats]
+        print(
+            "{:<20s} {:>12s} {:>12s} {:>12s} {:>10s}".format(
+                "timestep", "min", "max", "mean", "nonzero"
+            )
+        )
+        for name in names:
+            s = proc.stats[name]
+            print(
+                "{:<20s} {:>12.4g} {:>12.4g} {:>12.4g} {:>10d}".format(
+                    name, s["min"], s["max"], s["mean"], s["nonzero"]
+                )
+            )
+        print(f"global range: [{proc.vmin:.4g}, {proc.vmax:.4g}]")
+        if proc.histogram is not None and proc.histogram.n_positive:
+            lo, hi = proc.color_limits("positive")
+            print(f"positive range: [{lo:.4g}, {hi:.4g}]")
+            lo, hi = proc.color_limits((1, 99))
+            print(f"1st-99th percentile: [{lo:.4g}, {hi:.4g}]")
+        stage.add(timesteps=len(names))
+
+
+def _plot(proc, args):
+    proc.plot_solver(
+        vmin=args.vmin,
+        vmax=args.vmax,
+        only_changed=args.only_changed,
+        jobs=args.jobs,
+        preview=args.preview,
+        steps=args.steps,
+        limits=args.limits,
+        raster=args.raster,
+    )
+
+
+def _animate(proc, args):
+    proc.animate(
+        args.output,
+        frame_rate=args.frame_rate,
+        stride=args.stride,
+        downscale=args.downscale,
+        jobs=args.jobs,
+        preview=args.preview,
+        steps=args.steps,
+        limits=args.limits,
+        raster=args.raster,
+    )
+
+
+def _process(proc, args):
+    proc.process(
+        npy=not args.no_npy,
+        vmin=args.vmin,
+        vmax=args.vmax,
+        jobs=args.jobs,
+        hash=args.hash,
+        preview=args.preview,
+        steps=args.steps,
+        limits=args.limits,
+        raster=args.raster,
+    )
+
+
+def _fit(proc, args):
+    names = proc.select(args.steps)[:: args.stride]
+    profiles = proc.kymograph(stride=args.stride, jobs=args.jobs, steps=args.steps)
+
+    with proc.report.stage("fit", "profiles") as stage:
+        x = np.arange(profiles.shape[1], dtype=float)
+        res = fit_exp_batch(x, profiles, jobs=args.jobs)
+        stage.add(profiles=len(names))
+
+    rows = [
+        (f.rsplit(".", 1)[0], c0, lam, b)
+        for f, c0, lam, b in zip(names, res.c0, res.lam, res.b)
+    ]
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestep", "c0", "lambda", "b"])
+            writer.writerows(rows)
+        print(f"Fit saved to {args.output}")
+    else:
+        for row in rows:
+            print("{:<20s} C0={:.4f}  Lambda={:.4f} b={:.4f}".format(*row))
+
+
+def _sweep(sweep, args):
+    sweep.run(
+        only_changed=args.only_changed,
+        plot=not args.no_plot,
+        fit=not args.no_fit,
+        steps=args.steps,
+    )
+    if args.output:
+        sweep.save_table(args.output)
+        print(f"Table saved to {args.output}")
+        return
+
+    print(" ".join("{:>12s}".format(c) for c in TABLE_COLUMNS[1:]), " run")
+    for row in sweep.table():
+        values = " ".join("{:>12.4g}".format(row[c]) for c in TABLE_COLUMNS[1:])
+        print(values, "", row["run"])
+
+
+def _limits(text):
+    # "positive" or "LO:HI" percentiles
+    if text == "positive":
+        return text
+    try:
+        lo, hi = (float(p) for p in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'"{text}" is not "positive" or LO:HI')
+
+    return lo, hi
+
+
+def _step_slice(text):
+    # "5000::10" -> slice(5000, None, 10), bounds are steps
+    parts = [int(p) if p else None for p in text.split(":")]
+    if len(parts) > 3:
+        raise argparse.ArgumentTypeError(f'"{text}" is not START:STOP:STRIDE')
+
+    return slice(*parts) if len(parts) > 1 else slice(parts[0], parts[0] + 1)
+
+
+_COMMANDS = {
+    "convert": _convert,
+    "stats": _stats,
+    "plot": _plot,
+    "animate": _animate,
+    "process": _process,
+    "fit": _fit,
+    "sweep": _sweep,
+}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="lbibhelper", description="Process LBIBCell solver output."
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("directory", help="LBIBCell output directory")
+    common.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=default_num_threads,
+        help="worker processes (default: %(default)s)",
+    )
+    preview = argparse.ArgumentParser(add_help=False)
+    preview.add_argument(
+        "--preview",
+        type=int,
+        nargs="?",
+        const=PREVIEW_SIZE,
+        default=None,
+        metavar="PIXELS",
+        help="fast low-resolution frames, at most PIXELS per side",
+    )
+    preview.add_argument(
+        "--raster",
+        action="store_true",
+        help="colour frames in NumPy on a template drawn once, much faster",
+    )
+    preview.add_argument(
+        "--limits",
+        type=_limits,
+        default=None,
+        metavar="LO:HI",
+        help='colour scale from percentiles of the positive values, or "positive"',
+    )
+    common.add_argument(
+        "--profile",
+        action="store_true",
+        help="run under cProfile and print the hottest functions",
+    )
+    common.add_argument(
+        "--steps",
+        type=_step_slice,
+        default=None,
+        metavar="START:STOP:STRIDE",
+        help="only timesteps START <= step < STOP, every STRIDE-th output",
+    )
+    common.add_argument(
+        "--report", default=None, metavar="FILE", help="write a JSON run report"
+    )
+    common.add_argument(
+        "-q", "--quiet", action="store_true", help="no progress on stderr"
+    )
+
+    sub = parser.add_subparsers(dest="command")
+    sub.required = True
+
+    p = sub.add_parser("convert", parents=[common], help="convert text output to .npy")
+    p.add_argument("--only-changed", action="store_true", help="skip unchanged files")
+    p.add_argument("--store", action="store_true", help="write one (T, X, Y) store")
+    p.add_argument("--hash", action="store_true", help="record content hashes")
+    p.add_argument(
+        "--sparse", action="store_true", help="store mostly empty frames compacted"
+    )
+
+    sub.add_parser("stats", parents=[common], help="per-timestep statistics")
+
+    p = sub.add_parser(
+        "plot", parents=[common, preview], help="plot every timestep to PNG"
+    )
+    p.add_argument("--only-changed", action="store_true", help="skip unchanged frames")
+    p.add_argument("--vmin", type=float, default=None)
+    p.add_argument("--vmax", type=float, default=None)
+
+    p = sub.add_parser("animate", parents=[common, preview], help="render a GIF or MP4")
+    p.add_argument("-o", "--output", default="solver.gif")
+    p.add_argument("--frame-rate", type=float, default=24)
+    p.add_argument("--stride", type=int, default=1, help="use every n-th timestep")
+    p.add_argument("--downscale", type=float, default=1)
+
+    p = sub.add_parser(
+        "process",
+        parents=[common, preview],
+        help="convert and plot in one pipelined pass",
+    )
+    p.add_argument("--no-npy", action="store_true", help="do not keep .npy files")
+    p.add_argument("--hash", action="store_true", help="record content hashes")
+    p.add_argument("--vmin", type=float, default=None)
+    p.add_argument("--vmax", type=float, default=None)
+
+    p = sub.add_parser(
+        "fit", parents=[common], help="fit the decay length per timestep"
+    )
+    p.add_argument("-o", "--output", default=None, help="write the fits as CSV")
+    p.add_argument("--stride", type=int, default=1, help="use every n-th timestep")
+
+    p = sub.add_parser(
+        "sweep",
+        parents=[common],
+        help="process every run below a directory on one worker pool",
+    )
+    p.add_argument("--only-changed", action="store_true", help="skip unchanged files")
+    p.add_argument("--no-plot", action="store_true", help="do not plot the frames")
+    p.add_argument("--no-fit", action="store_true", help="do not fit lambda")
+    p.add_argument("-o", "--output", default=None, help="write the table as CSV")
+
+    return parser
+
+
+def main(argv=None):
     """Console script for lbibhelper."""
-    parser = argparse.ArgumentParser()
-    parser.add_argument("_", nargs="*")
-    args = parser.parse_args()
+    args = get_parser().parse_args(argv)
+
+    report = RunReport(None if args.quiet else [print_progress])
+    report.info["command"] = args.command
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    with report.stage("load", "runs") as stage:
+        if args.command == "sweep":
+            proc = SweepProcessor(args.directory, args.jobs, report=report)
+            stage.add(runs=len(proc.runs))
+        else:
+            proc = SolverProcessor(args.directory, report=report)
+            stage.add(runs=1)
+    _COMMANDS[args.command](proc, args)
+
+    if profiler:
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
 
-    print("Arguments: " + str(args._))
-    print("Replace this message by putting your code into " "lbibhelper.cli.main")
+    _print_summary(report)
+    if args.report:
+        report.save(args.report)
+        print(f"Report saved to {args.report}")
     return 0
 
 
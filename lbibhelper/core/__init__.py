@@ -1,4 +1,6 @@
 from .plot import *
+from .instrument import *
 from .util import *
+from .synthetic import *
 
 __all__ = [s for s in dir() if not s.startswith("_")]
@@ -0,0 +1,160 @@
+import datetime
+import json
+import os
+import sys
+import time
+
+
+def peak_memory():
+    """Peak resident memory in bytes of this process or any finished worker.
+
+    None where the `resource` module is missing, e.g. on Windows.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def print_progress(event):
+    """Default progress callback, one updating line per stage on stderr."""
+    if event["finished"]:
+        line = "{:s} {:d} {:s} in {:.2f} s".format(
+            event["stage"], event["done"], event["unit"], event["elapsed"]
+        )
+    else:
+        total = "/{:d}".format(event["total"]) if event["total"] else ""
+        line = "{:s} {:d}{:s} {:s}".format(
+            event["stage"], event["done"], total, event["item"] or ""
+        )
+
+    # padded over the remains of a longer previous line
+    end = "\n" if event["finished"] else ""
+    print("\r{:<79s}".format(line), end=end, file=sys.stderr)
+
+
+class Stage:
+    """Wall time and counters of one pipeline stage.
+
+    Entering the same stage again, also nested, accumulates into it.
+    `unit` names the counter reported as the throughput of the stage.
+    """
+
+    def __init__(self, report, name, unit="files"):
+        self.report = report
+        self.name = name
+        self.unit = unit
+        self.elapsed = 0.0
+        self.counters = {}
+        self._depth = 0
+        self._start = None
+
+    def __enter__(self):
+        if self._depth == 0:
+            self._start = time.perf_counter()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            self.elapsed += time.perf_counter() - self._start
+            self.report._emit(self, None, None, finished=True)
+
+    @property
+    def count(self):
+        return self.counters.get(self.unit, 0)
+
+    def add(self, **counters):
+        """Add to counters, e.g. ``stage.add(files=1, bytes=1024)``."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def progress(self, item=None, total=None, **counters):
+        """Add to counters and notify the callbacks of the report."""
+        self.add(**counters)
+        self.report._emit(self, item, total)
+
+    def to_dict(self):
+        elapsed = self.elapsed
+        if self._depth:
+            elapsed += time.perf_counter() - self._start
+
+        res = {"seconds": elapsed, "unit": self.unit, "counters": dict(self.counters)}
+        if elapsed > 0:
+            res["rates"] = {k: v / elapsed for k, v in self.counters.items()}
+
+        return res
+
+
+class RunReport:
+    """Timers, counters and progress hooks of a processing run.
+
+    Parameters
+    ----------
+    callbacks: list, optional
+            Functions called with a progress event dict with keys
+            "stage", "unit", "item", "done", "total", "elapsed" and
+            "finished"
+    """
+
+    def __init__(self, callbacks=None):
+        self.callbacks = list(callbacks or [])
+        self.stages = {}
+        self.info = {}
+        self.created = datetime.datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+
+    def stage(self, name, unit="files"):
+        """The `Stage` called `name`, use it as a context manager to time it."""
+        if name not in self.stages:
+            self.stages[name] = Stage(self, name, unit)
+
+        return self.stages[name]
+
+    def _emit(self, stage, item, total, finished=False):
+        if not self.callbacks:
+            return
+
+        event = {
+            "stage": stage.name,
+            "unit": stage.unit,
+            "item": item,
+            "done": stage.count,
+            "total": total,
+            "elapsed": time.perf_counter() - stage._start,
+            "finished": finished,
+        }
+        for callback in self.callbacks:
+            callback(event)
+
+    def to_dict(self):
+        return {
+            "created": self.created,
+            "seconds": time.perf_counter() - self._start,
+            "peak_memory": peak_memory(),
+            "info": self.info,
+            "stages": {name: s.to_dict() for name, s in self.stages.items()},
+        }
+
+    def save(self, filename):
+        """Write the report as JSON."""
+        tmp = "{}.tmp".format(filename)
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp, filename)
+
+
+__all__ = [
+    "peak_memory",
+    "print_progress",
+    "Stage",
+    "RunReport",
+]
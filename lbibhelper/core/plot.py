@@ -15,6 +15,28 @@ tex_fonts = {
 }
 
 
+def get_pyplot():
+    """Import matplotlib.pyplot on first use.
+
+    matplotlib is only loaded when something is actually plotted, so
+    conversion workers and the CLI start without it. On linux the
+    backend is switched to Agg.
+    """
+    import matplotlib.pyplot as plt
+    from lbibhelper.core.settings import get_os_name
+
+    global _backend_set
+    if not _backend_set:
+        if get_os_name() == "linux":
+            plt.switch_backend("Agg")
+        _backend_set = True
+
+    return plt
+
+
+_backend_set = False
+
+
 def get_inch_from_pts(width, fraction=1):
     """Set figure dimensions to avoid scaling in LaTeX.
 
@@ -38,7 +60,7 @@ def get_inch_from_pts(width, fraction=1):
 
     # Golden ratio to set aesthetic figure height
     # https://disq.us/p/2940ij3
-    golden_ratio = (5 ** 0.5 - 1) / 2
+    golden_ratio = (5**0.5 - 1) / 2
 
     # Figure width in inches
     fig_width_in = fig_width_pt * inches_per_pt
@@ -52,5 +74,6 @@ def get_inch_from_pts(width, fraction=1):
 
 __all__ = [
     "get_inch_from_pts",
+    "get_pyplot",
     "tex_fonts",
 ]
@@ -2,11 +2,10 @@ import os
 from os import SEEK_END
 import platform
 import multiprocessing
-import subprocess
-import sys
 
 default_num_threads = multiprocessing.cpu_count()
 
+
 # TODO: use colorama instead like taichi
 class bcolors:
     HEADER = "\033[95m"
@@ -38,18 +37,59 @@ def check_exists(src):
         raise FileNotFoundError(f'File "{src}" not exist.')
 
 
-def readlast(filename):
-    # not pythonic, only works on unix platform
-    # https://stackoverflow.com/questions/3346430/what-is-the-most-efficient-way-to-get-first-and-last-line-of-a-text-file # too complicated
-    if get_os_name() == "win":
-        with open(filename, "r") as f:
-            res = f.readlines()[-1]
-    else:
-        res = subprocess.check_output(["tail", "-1", filename]).decode(
-            sys.stdout.encoding
-        )
+_READ_BLOCK = 4096
+
+
+def _is_data_row(line):
+    fields = line.split()
+    if not fields:
+        return False
+    try:
+        float(fields[0])
+    except ValueError:
+        return False
+    return True
+
+
+def read_first_last(filename, block_size=_READ_BLOCK):
+    """First line, last line and offset of the first data row of a text file.
 
-    return res
+    The last line is found by seeking backwards from the end in blocks of
+    `block_size` bytes, so memory does not depend on the file size.
+
+    Returns
+    -------
+    first: str
+            First line, without line ending
+    last: str
+            Last non-empty line, without line ending
+    data_offset: int
+            Byte offset where data rows start, i.e. 0 unless the first
+            line is a non-numeric header
+    """
+    with open(filename, "rb") as f:
+        first = f.readline()
+        data_offset = 0 if _is_data_row(first) else len(first)
+
+        f.seek(0, SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            tail = buf.rstrip(b"\r\n")
+            if b"\n" in tail:
+                buf = tail[tail.rindex(b"\n") + 1 :]
+                break
+        last = buf.rstrip(b"\r\n")
+
+    return first.rstrip(b"\r\n").decode(), last.decode(), data_offset
+
+
+def readlast(filename):
+    return read_first_last(filename)[1]
 
 
 # The builtin `warnings` module is unreliable as it may be supressed
@@ -66,6 +106,7 @@ def warning(msg, type=UserWarning, stacklevel=1):
 __all__ = [
     "warning",
     "readlast",
+    "read_first_last",
     "check_exists",
     "get_os_name",
 ]
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+
+
+def synthetic_field(size_x, size_y, t=1.0, sparsity=0.0, lam=None, seed=0):
+    """Shh-like field c = c0 * t * exp(-y / lam), with a fraction of zero cells.
+
+    Parameters
+    ----------
+    size_x, size_y: int
+            LB grid size
+    t: float, optional
+            Amplitude of the timestep
+    sparsity: float, optional
+            Fraction of cells set to exactly 0.0
+    lam: float, optional
+            Decay length along y, a fifth of size_y by default
+    seed: int, optional
+            Seed of the zero mask
+
+    Returns
+    -------
+    mat: np.ndarray
+            Matrix of shape (size_x, size_y)
+    """
+    if lam is None:
+        lam = max(size_y / 5, 1.0)
+
+    y = np.arange(size_y, dtype=float)
+    mat = np.tile(t * np.exp(-y / lam), (size_x, 1))
+
+    if sparsity > 0:
+        rng = np.random.default_rng(seed)
+        mat[rng.random(mat.shape) < sparsity] = 0.0
+
+    return mat
+
+
+def write_solver_txt(filename, mat):
+    """Write `mat` in the tab separated layout of LBIBCell Cells_N.txt.
+
+    One row per grid point, x outer and y inner, the value in column 5.
+    """
+    size_x, size_y = mat.shape
+    x, y = np.meshgrid(np.arange(size_x), np.arange(size_y), indexing="ij")
+    rows = np.column_stack([x.ravel(), y.ravel(), np.zeros((mat.size, 3)), mat.ravel()])
+    np.savetxt(filename, rows, fmt=["%d"] * 5 + ["%.9g"], delimiter="\t")
+
+
+def write_synthetic_run(
+    directory, size_x=100, size_y=30, n_steps=10, step=100, sparsity=0.0, seed=0
+):
+    """Write a fake LBIBCell output directory with Cells_N.txt and log.txt.
+
+    Parameters
+    ----------
+    directory: str
+            Output directory, created if needed
+    size_x, size_y: int, optional
+            LB grid size
+    n_steps: int, optional
+            Number of solver outputs
+    step: int, optional
+            Timesteps between two outputs
+    sparsity: float, optional
+            Fraction of zero cells in every output
+
+    Returns
+    -------
+    files: list
+            Paths of the written solver outputs
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    files = []
+    for i in range(n_steps):
+        mat = synthetic_field(size_x, size_y, i + 1, sparsity, seed=seed + i)
+        filename = os.path.join(directory, "Cells_{:d}.txt".format(i * step))
+        write_solver_txt(filename, mat)
+        files.append(filename)
+
+    with open(os.path.join(directory, "log.txt"), "w") as f:
+        f.write("synthetic LBIBCell run\n")
+        f.write("grid: {:d} x {:d}\n".format(size_x, size_y))
+        f.write("outputs: {:d} every {:d} steps\n".format(n_steps, step))
+
+    return files
+
+
+__all__ = [
+    "synthetic_field",
+    "write_solver_txt",
+    "write_synthetic_run",
+]
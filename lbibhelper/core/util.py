@@ -0,0 +1,25 @@
+import sys
+import types
+
+
+def lazy_attributes(module_name, loaders):
+    """Resolve some attributes of a module only on first access.
+
+    `loaders` maps attribute names to functions returning their value.
+    The module's class is swapped instead of defining a module level
+    ``__getattr__``, which needs Python 3.7.
+    """
+
+    class LazyModule(types.ModuleType):
+        def __getattr__(self, name):
+            if name in loaders:
+                return loaders[name]()
+
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+
+    sys.modules[module_name].__class__ = LazyModule
+
+
+__all__ = [
+    "lazy_attributes",
+]
@@ -1,3 +1,17 @@
+from lbibhelper.core.plot import get_pyplot as _get_pyplot
+from lbibhelper.core.util import lazy_attributes as _lazy_attributes
 from .solver import *
+from .batch import *
+from .physical import *
 
 __all__ = [s for s in dir() if not s.startswith("_")]
+
+
+def _curve_fit():
+    from scipy.optimize import curve_fit
+
+    return curve_fit
+
+
+# names of the former eager scipy/matplotlib imports, loaded on first access
+_lazy_attributes(__name__, {"curve_fit": _curve_fit, "plt": _get_pyplot})
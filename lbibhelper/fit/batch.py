@@ -0,0 +1,89 @@
+import multiprocessing
+from collections import namedtuple
+import numpy as np
+from lbibhelper.core.settings import default_num_threads
+from .solver import model_func
+
+ExpFitResult = namedtuple("ExpFitResult", ["c0", "k", "b", "lam", "pcov"])
+
+
+def model_func_jac(x, c0, k, b):
+    # d/dc0, d/dk, d/db of model_func
+    e = np.exp(-k * x)
+    return np.stack([e, -c0 * x * e, np.ones_like(x)], axis=-1)
+
+
+def _fit_chunk(args):
+    # fit consecutive profiles, each starting from the previous solution
+    from scipy.optimize import curve_fit
+
+    x, profiles, p0, maxfev = args
+    popt = np.full((len(profiles), 3), np.nan)
+    pcov = np.full((len(profiles), 3, 3), np.nan)
+
+    start = np.asarray(p0, dtype=float)
+    for i, y in enumerate(profiles):
+        try:
+            popt[i], pcov[i] = curve_fit(
+                model_func, x, y, start, jac=model_func_jac, maxfev=maxfev
+            )
+        except (RuntimeError, ValueError):
+            continue
+        start = popt[i]
+
+    return popt, pcov
+
+
+def fit_exp_batch(x, profiles, p0=(1, 2, 1.0), jobs=default_num_threads, maxfev=5000):
+    """Fit `model_func` to a stack of profiles, e.g. one per timestep.
+
+    The profiles are split into `jobs` contiguous chunks fitted in
+    parallel. Within a chunk every fit is warm-started from the solution
+    of the previous timestep, only the first one starts from `p0`.
+    Profiles that fail to converge get NaN parameters.
+
+    Parameters
+    ----------
+    x: np.ndarray
+            Positions, shape (X,)
+    profiles: np.ndarray
+            Profiles, shape (T, X)
+    p0: tuple, optional
+            Starting point (c0, k, b)
+    jobs: int, optional
+            Number of worker processes
+
+    Returns
+    -------
+    res: ExpFitResult
+            Arrays c0, k, b and lam = 1 / k of shape (T,) and the
+            covariances pcov of shape (T, 3, 3)
+    """
+    x = np.asarray(x, dtype=float)
+    profiles = np.atleast_2d(np.asarray(profiles, dtype=float))
+
+    jobs = max(1, min(jobs, len(profiles)))
+    chunks = [
+        (x, chunk, p0, maxfev) for chunk in np.array_split(profiles, jobs) if len(chunk)
+    ]
+    if jobs == 1:
+        results = list(map(_fit_chunk, chunks))
+    else:
+        with multiprocessing.Pool(jobs) as pool:
+            results = pool.map(_fit_chunk, chunks)
+
+    popt = np.concatenate([r[0] for r in results])
+    pcov = np.concatenate([r[1] for r in results])
+    c0, k, b = popt.T
+
+    with np.errstate(divide="ignore"):
+        lam = 1 / k
+
+    return ExpFitResult(c0, k, b, lam, pcov)
+
+
+__all__ = [
+    "ExpFitResult",
+    "model_func_jac",
+    "fit_exp_batch",
+]
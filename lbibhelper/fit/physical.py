@@ -0,0 +1,132 @@
+from collections import namedtuple
+import numpy as np
+from .solver import shh_read_out_analytic_sol_batch
+
+ShhFitResult = namedtuple("ShhFitResult", ["p_d", "k", "lam", "pcov", "nfev"])
+
+# p and d alone are not identifiable from a profile, only a = p / d is fitted
+
+
+def shh_model_inf_jac(x, a, k, Lf):
+    """Jacobian (d/da, d/dk) of the infinite domain read-out, shape (n_x, 2).
+
+    a = p / d, the read-out is shh_read_out_analytic_sol_inf(x, a, 1, Lf, Lt, k).
+    """
+    with np.errstate(over="ignore", invalid="ignore"):
+        e = np.exp(-Lf * k)
+        cf_a = 1 - e * np.cosh(x * k)
+        cf_k = a * e * (Lf * np.cosh(x * k) - x * np.sinh(x * k))
+
+        ex = np.exp(-x * k)
+        cp_a = np.sinh(Lf * k) * ex
+        cp_k = a * ex * (Lf * np.cosh(Lf * k) - x * np.sinh(Lf * k))
+
+    cf = x <= Lf
+    return np.stack([np.where(cf, cf_a, cp_a), np.where(cf, cf_k, cp_k)], axis=-1)
+
+
+def shh_model_jac(x, a, k, Lf, Lt):
+    """Jacobian (d/da, d/dk) of the finite domain read-out, shape (n_x, 2).
+
+    a = p / d, the read-out is shh_read_out_analytic_sol(x, a, 1, Lf, Lt, k).
+    """
+    with np.errstate(over="ignore", invalid="ignore"):
+        s_t = np.sinh(Lt * k)
+        c_t = np.cosh(Lt * k)
+
+        # x <= Lf: a * (1 + r * cosh(x k)), r = sinh((Lf - Lt) k) / sinh(Lt k)
+        r = np.sinh((Lf - Lt) * k) / s_t
+        dr = (
+            (Lf - Lt) * np.cosh((Lf - Lt) * k) * s_t - Lt * np.sinh((Lf - Lt) * k) * c_t
+        ) / s_t**2
+        cf_a = 1 + r * np.cosh(x * k)
+        cf_k = a * (dr * np.cosh(x * k) + r * x * np.sinh(x * k))
+
+        # x > Lf: a * q * cosh((Lt - x) k), q = sinh(Lf k) / sinh(Lt k)
+        q = np.sinh(Lf * k) / s_t
+        dq = (Lf * np.cosh(Lf * k) * s_t - Lt * np.sinh(Lf * k) * c_t) / s_t**2
+        cp_a = q * np.cosh((Lt - x) * k)
+        cp_k = a * (dq * np.cosh((Lt - x) * k) + q * (Lt - x) * np.sinh((Lt - x) * k))
+
+    cf = x <= Lf
+    return np.stack([np.where(cf, cf_a, cp_a), np.where(cf, cf_k, cp_k)], axis=-1)
+
+
+def _pcov(res, n):
+    # same covariance estimate as scipy.optimize.curve_fit
+    _, s, vt = np.linalg.svd(res.jac, full_matrices=False)
+    threshold = np.finfo(float).eps * max(res.jac.shape) * s[0]
+    s = s[s > threshold]
+    vt = vt[: s.size]
+    pcov = np.dot(vt.T / s**2, vt)
+
+    dof = n - res.x.size
+    if dof > 0:
+        pcov = pcov * 2 * res.cost / dof
+    else:
+        pcov.fill(np.inf)
+
+    return pcov
+
+
+def fit_shh(x, y, Lf, Lt=None, p0=None, bounds=((0.0, 0.0), (np.inf, np.inf))):
+    """Fit p / d and k of the Shh read-out to a profile, Lf and Lt held fixed.
+
+    Uses the closed-form Jacobians, so every iteration costs a single
+    model evaluation instead of one per parameter.
+
+    Parameters
+    ----------
+    x, y: np.ndarray
+            Profile to fit
+    Lf: float
+            Boundary of the source region
+    Lt: float, optional
+            Length of the finite domain, the infinite domain solution is
+            fitted if not given
+    p0: tuple, optional
+            Starting point (p / d, k), guessed from the profile if not given
+    bounds: tuple, optional
+            Lower and upper bounds of (p / d, k)
+
+    Returns
+    -------
+    res: ShhFitResult
+            p_d, k, lam = 1 / k, their covariance pcov and the number of
+            function evaluations nfev
+    """
+    from scipy.optimize import least_squares
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    inf = Lt is None
+
+    def residual(theta):
+        a, k = theta
+        res = shh_read_out_analytic_sol_batch(x, a, 1.0, Lf, Lt or 0.0, k, inf=inf)
+        return res[0] - y
+
+    def jac(theta):
+        a, k = theta
+        if inf:
+            return shh_model_inf_jac(x, a, k, Lf)
+        return shh_model_jac(x, a, k, Lf, Lt)
+
+    if p0 is None:
+        span = np.ptp(x) if x.size > 1 else 1.0
+        p0 = (max(np.max(np.abs(y)), 1e-12), 10.0 / max(span, 1e-12))
+    p0 = np.clip(p0, bounds[0], bounds[1])
+
+    res = least_squares(residual, p0, jac=jac, bounds=bounds, method="trf")
+    a, k = res.x
+
+    return ShhFitResult(a, k, 1 / k if k else np.inf, _pcov(res, y.size), res.nfev)
+
+
+__all__ = [
+    "ShhFitResult",
+    "shh_model_jac",
+    "shh_model_inf_jac",
+    "fit_shh",
+]
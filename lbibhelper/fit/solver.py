@@ -1,6 +1,5 @@
 import numpy as np
-from scipy.optimize import curve_fit
-import matplotlib.pyplot as plt
+from lbibhelper.core.plot import get_pyplot
 
 
 def shh_readout_anl_sol_inf_cf(x, p, d, Lf, Lt, k):
@@ -14,13 +13,8 @@ def shh_readout_anl_sol_inf_cp(x, p, d, Lf, Lt, k):
 
 
 def shh_read_out_analytic_sol_inf(x, p, d, Lf, Lt, k):
-    res = np.zeros_like(x)
-    cf_idx = x <= Lf
-    cp_idx = x > Lf
-    res[cf_idx] = shh_readout_anl_sol_inf_cf(x[cf_idx], p, d, Lf, Lt, k)
-    res[cp_idx] = shh_readout_anl_sol_inf_cp(x[cp_idx], p, d, Lf, Lt, k)
-
-    return res
+    res = shh_read_out_analytic_sol_batch(x, p, d, Lf, Lt, k, inf=True)
+    return res[0].reshape(np.shape(x))
 
 
 def shh_readout_anl_sol_cf(x, p, d, Lf, Lt, k):
@@ -34,13 +28,43 @@ def shh_readout_anl_sol_cp(x, p, d, Lf, Lt, k):
 
 
 def shh_read_out_analytic_sol(x, p, d, Lf, Lt, k):
-    res = np.zeros_like(x)
-    cf_idx = x <= Lf
-    cp_idx = x > Lf
-    res[cf_idx] = shh_readout_anl_sol_cf(x[cf_idx], p, d, Lf, Lt, k)
-    res[cp_idx] = shh_readout_anl_sol_cp(x[cp_idx], p, d, Lf, Lt, k)
+    res = shh_read_out_analytic_sol_batch(x, p, d, Lf, Lt, k)
+    return res[0].reshape(np.shape(x))
+
+
+def shh_read_out_analytic_sol_batch(x, p, d, Lf, Lt, k, inf=False):
+    """Evaluate the Shh read-out for many parameter sets in one pass.
+
+    Parameters
+    ----------
+    x: array_like
+            Positions, flattened to n_x values
+    p, d, Lf, Lt, k: float or array_like
+            Parameters, broadcast against each other to n_params sets
+    inf: bool, optional
+            Use the infinite domain solution, Lt is ignored then
+
+    Returns
+    -------
+    res: np.ndarray
+            Read-out of shape (n_params, n_x)
+    """
+    x = np.asarray(x, dtype=float).reshape(1, -1)
+    params = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (p, d, Lf, Lt, k))
+    )
+    p, d, Lf, Lt, k = (v.reshape(-1, 1) for v in params)
 
-    return res
+    # both branches are evaluated everywhere, the unused one may overflow
+    with np.errstate(over="ignore", invalid="ignore"):
+        if inf:
+            cf = shh_readout_anl_sol_inf_cf(x, p, d, Lf, Lt, k)
+            cp = shh_readout_anl_sol_inf_cp(x, p, d, Lf, Lt, k)
+        else:
+            cf = shh_readout_anl_sol_cf(x, p, d, Lf, Lt, k)
+            cp = shh_readout_anl_sol_cp(x, p, d, Lf, Lt, k)
+
+    return np.where(x <= Lf, cf, cp)
 
 
 def model_func(x, c0, k, b):
@@ -49,12 +73,15 @@ def model_func(x, c0, k, b):
 
 
 def fit_exp(x, y, p0=(1, 2, 1.0)):
+    from scipy.optimize import curve_fit
+
     # p0 # starting search koefs
     popt, pcov = curve_fit(model_func, x, y, p0, maxfev=5000)
     return popt
 
 
 def plot_and_fit(x, y, label, show=False, filename=None, log=False, anl_param=None):
+    plt = get_pyplot()
     fig, ax = plt.subplots()
     ax.scatter(x, y, label=label, s=2.4, alpha=0.9, c="lightsteelblue")
     popt = fit_exp(x, y)
@@ -69,11 +96,9 @@ def plot_and_fit(x, y, label, show=False, filename=None, log=False, anl_param=No
         ax.set_yscale("log")
 
     if anl_param:
-        y_anl = np.zeros_like(x_fit)
         p, d, Lf, Lt = anl_param
         k = popt[1]
-        for i in range(x_fit.shape[0]):
-            y_anl[i] = shh_read_out_analytic_sol_inf(x_fit[i], p, d, Lf, Lt, k)
+        y_anl = shh_read_out_analytic_sol_inf(x_fit, p, d, Lf, Lt, k)
 
         ax.plot(x_fit, y_anl, label="Analtic solution", c="seagreen", linestyle="--")
 
@@ -1,4 +1,16 @@
 from .video import *
-from .solver_processor import SolverProcessor
+from .parser import *
+from .stats import *
+from .store import *
+from .manifest import *
+from .raster import *
+from .render import *
+from .reduce import *
+from .sparse import *
+from .sketch import *
+from .pipeline import *
+from .timesteps import *
+from .solver_processor import ConvertTask, ProfileTask, SolverProcessor, run_task
+from .sweep import *
 
 __all__ = [s for s in dir() if not s.startswith("_")]
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILENAME = "solver_manifest.json"
+
+# sections of the manifest, one per pipeline stage
+CONVERTED = "converted"
+RENDERED = "rendered"
+
+_HASH_BLOCK = 1 << 20
+
+
+def file_hash(filename):
+    """blake2b digest of a file, read in 1 MiB blocks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def file_signature(filename, hash=False):
+    """Size and mtime (and optionally a content hash) of a file."""
+    st = os.stat(filename)
+    sig = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if hash:
+        sig["hash"] = file_hash(filename)
+
+    return sig
+
+
+def is_changed(filename, sig, hash=False):
+    """Whether `filename` differs from the recorded signature `sig`.
+
+    With `hash`, a file whose size or mtime moved but whose content hash
+    is unchanged (e.g. only touched) is not considered changed, and its
+    new mtime is recorded in `sig` so the next check needs no hash.
+    """
+    if not sig:
+        return True
+
+    st = os.stat(filename)
+    if st.st_size == sig.get("size") and st.st_mtime_ns == sig.get("mtime_ns"):
+        return False
+
+    if hash and "hash" in sig and st.st_size == sig.get("size"):
+        if file_hash(filename) != sig["hash"]:
+            return True
+        sig["mtime_ns"] = st.st_mtime_ns
+        return False
+
+    return True
+
+
+def load_manifest(filename):
+    """Read a manifest, empty sections if there is none."""
+    manifest = {CONVERTED: {}, RENDERED: {}}
+    if not os.path.isfile(filename):
+        return manifest
+
+    try:
+        with open(filename, "r") as f:
+            manifest.update(json.load(f))
+    except ValueError:
+        pass
+
+    return manifest
+
+
+def save_manifest(filename, manifest):
+    tmp = "{}.tmp".format(filename)
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, filename)
+
+
+__all__ = [
+    "file_hash",
+    "file_signature",
+    "is_changed",
+    "load_manifest",
+    "save_manifest",
+]
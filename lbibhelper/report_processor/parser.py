@@ -0,0 +1,289 @@
+import io
+import os
+import warnings
+import numpy as np
+
+# column of the solver output holding the Shh concentration
+SOLVER_VALUE_COLUMN = 5
+
+# bytes read at once by the chunked parsers, files up to this size are
+# parsed in one go
+CHUNK_SIZE = 1 << 22
+
+# numpy >= 1.23 ships a C implementation of loadtxt
+_C_LOADTXT = tuple(int(v) for v in np.__version__.split(".")[:2]) >= (1, 23)
+
+
+def _read_bytes(file):
+    try:
+        with open(file, "rb") as f:
+            return f.read()
+    except IOError:
+        raise IOError(f'"{file}" does not exist or cannot be opened.')
+
+
+def iter_blocks(file, chunk_size=CHUNK_SIZE):
+    """Read `file` in blocks of about `chunk_size` bytes, cut at line ends.
+
+    The partial last line of a block is carried over to the next one, so
+    every block holds whole lines only. A line longer than `chunk_size`
+    makes its block grow until the line is complete.
+    """
+    carry = b""
+    try:
+        f = open(file, "rb")
+    except IOError:
+        raise IOError(f'"{file}" does not exist or cannot be opened.')
+
+    with f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:
+                carry += block
+                continue
+            yield carry + block[:cut]
+            carry = block[cut:]
+
+    if carry.strip():
+        yield carry
+
+
+def _tokenize(buf, usecols=None):
+    """Turn a tab separated text buffer into a (n_rows, n_cols) float array.
+
+    Raises ValueError if the buffer is not a clean numeric table.
+    """
+    if _C_LOADTXT:
+        return np.loadtxt(io.BytesIO(buf), delimiter="\t", usecols=usecols, ndmin=2)
+
+    # pre 1.23 loadtxt is a python loop, fromstring is much faster there
+    text = buf.decode("ascii").strip()
+    if not text:
+        return np.zeros((0, len(usecols) if usecols else 0), dtype=float)
+
+    eol = text.find("\n")
+    n_cols = len((text if eol < 0 else text[:eol]).split())
+    n_rows = text.count("\n") + 1
+
+    with warnings.catch_warnings():
+        # older numpy only warns on unmatched data
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            values = np.fromstring(text, dtype=float, sep=" ")
+        except DeprecationWarning as e:
+            raise ValueError(str(e))
+
+    if values.size != n_rows * n_cols:
+        raise ValueError(
+            f"Expected {n_rows} rows of {n_cols} columns, got {values.size} values"
+        )
+
+    rows = values.reshape(n_rows, n_cols)
+    if usecols is not None:
+        rows = rows[:, list(usecols)]
+
+    return rows
+
+
+def _tokenize_lines(buf, column):
+    # python fallback of _tokenize for (x, y, column), skips empty lines
+    rows = [line.split(b"\t") for line in buf.splitlines() if line.strip()]
+    return np.array(
+        [(int(r[0]), int(r[1]), float(r[column])) for r in rows], dtype=float
+    ).reshape(-1, 3)
+
+
+def _zeros(size_x, size_y, out=None):
+    # zeroed (size_x, size_y) grid, `out` is reused if given
+    if out is None:
+        return np.zeros((size_x, size_y), dtype=float)
+    out[...] = 0.0
+
+    return out
+
+
+def _scatter(rows, mat):
+    # rows are (x, y, value)
+    x = rows[:, 0].astype(np.intp)
+    y = rows[:, 1].astype(np.intp)
+    mat[x, y] = rows[:, 2]
+
+    return mat
+
+
+def parse_solver_txt_lines(file, size_x, size_y, column=SOLVER_VALUE_COLUMN, out=None):
+    """Parse a solver output line by line.
+
+    Slow reference implementation, only used as a fallback for files
+    the bulk parser refuses, e.g. with ragged or non-numeric rows.
+    """
+    mat = _zeros(size_x, size_y, out)
+
+    try:
+        f_out = open(file, "r")
+    except IOError:
+        raise IOError(f'"{file}" does not exist or cannot be createed.')
+
+    with f_out:
+        for line in f_out:
+            line_list = line.rstrip("\n").split("\t")
+            x = int(line_list[0])
+            y = int(line_list[1])
+            c = float(line_list[column])
+            mat[x, y] = c
+
+    return mat
+
+
+def parse_solver_txt(
+    file, size_x, size_y, column=SOLVER_VALUE_COLUMN, out=None, chunk_size=CHUNK_SIZE
+):
+    """Parse a solver output like Cells_100.txt into a (size_x, size_y) matrix.
+
+    Files up to `chunk_size` are read in one go, tokenized by numpy and
+    the value column is scattered into the grid with a single fancy
+    assignment, larger ones go through `parse_solver_chunked`. Files
+    numpy refuses to parse go through the line by line reader.
+
+    Parameters
+    ----------
+    file: str
+            Path to the tab separated solver output
+    size_x, size_y: int
+            LB grid size
+    column: int, optional
+            Column to extract, defaults to the Shh concentration
+    out: np.ndarray, optional
+            (size_x, size_y) array to fill instead of a new one, e.g. a
+            memory map or a timestep of the solver store
+    chunk_size: int, optional
+            Larger files are parsed in blocks of this many bytes
+
+    Returns
+    -------
+    mat: np.ndarray
+            Matrix of shape (size_x, size_y), `out` if given
+    """
+    if os.path.getsize(file) > chunk_size:
+        return parse_solver_chunked(file, size_x, size_y, column, out, chunk_size)
+
+    return parse_solver_buffer(_read_bytes(file), size_x, size_y, column, file, out)
+
+
+def parse_solver_chunked(
+    file, size_x, size_y, column=SOLVER_VALUE_COLUMN, out=None, chunk_size=CHUNK_SIZE
+):
+    """Parse a solver output block by block into a preallocated grid.
+
+    Each block of `iter_blocks` is tokenized and scattered on its own, so
+    memory stays at about one block plus the grid whatever the file size,
+    and at one block if `out` is a memory map. Blocks numpy refuses are
+    parsed line by line. Arguments are the same as for `parse_solver_txt`.
+    """
+    mat = _zeros(size_x, size_y, out)
+    for block in iter_blocks(file, chunk_size):
+        try:
+            rows = _tokenize(block, usecols=(0, 1, column))
+        except (ValueError, UnicodeDecodeError):
+            rows = _tokenize_lines(block, column)
+        _scatter(rows, mat)
+
+    return mat
+
+
+def parse_solver_buffer(
+    buf, size_x, size_y, column=SOLVER_VALUE_COLUMN, file=None, out=None
+):
+    """`parse_solver_txt` on the bytes of a solver output already in memory.
+
+    `file` is only used by the line by line fallback, without it the
+    fallback reads the lines from `buf`.
+    """
+    try:
+        rows = _tokenize(buf, usecols=(0, 1, column))
+    except (ValueError, UnicodeDecodeError):
+        if file is not None:
+            return parse_solver_txt_lines(file, size_x, size_y, column, out)
+        rows = _tokenize_lines(buf, column)
+
+    return _scatter(rows, _zeros(size_x, size_y, out))
+
+
+def field_name(column):
+    # name of a solver output column in the fields store
+    return "c{:d}".format(column)
+
+
+def parse_solver_fields(file, size_x, size_y, dtype=np.float32, chunk_size=CHUNK_SIZE):
+    """Parse every value column of a solver output in a single pass.
+
+    The file is read in blocks, see `iter_blocks`, so memory stays at one
+    block plus the grids.
+
+    Parameters
+    ----------
+    file: str
+            Path to the tab separated solver output
+    size_x, size_y: int
+            LB grid size
+    dtype: np.dtype, optional
+            Type of the returned grids, float32 halves memory and disk
+    chunk_size: int, optional
+            Bytes parsed at once
+
+    Returns
+    -------
+    fields: dict
+            One (size_x, size_y) grid per column after x and y, keyed by
+            `field_name`, e.g. "c5" is the Shh concentration
+    """
+    fields = {}
+    try:
+        for block in iter_blocks(file, chunk_size):
+            rows = _tokenize(block)
+            x = rows[:, 0].astype(np.intp)
+            y = rows[:, 1].astype(np.intp)
+            for c in range(2, rows.shape[1]):
+                name = field_name(c)
+                if name not in fields:
+                    fields[name] = np.zeros((size_x, size_y), dtype=dtype)
+                fields[name][x, y] = rows[:, c]
+    except (ValueError, UnicodeDecodeError, IndexError):
+        with open(file, "rb") as f:
+            first = f.readline()
+        return {
+            field_name(c): parse_solver_txt_lines(file, size_x, size_y, c).astype(dtype)
+            for c in range(2, len(first.split()))
+        }
+
+    return fields
+
+
+def save_fields(filename, fields, compress=False):
+    """Save fields from `parse_solver_fields` to a .npz, one array per field."""
+    if compress:
+        np.savez_compressed(filename, **fields)
+    else:
+        np.savez(filename, **fields)
+
+
+def load_fields(filename):
+    """Open fields saved by `save_fields`, each field is read on access."""
+    return np.load(filename)
+
+
+__all__ = [
+    "CHUNK_SIZE",
+    "iter_blocks",
+    "parse_solver_txt",
+    "parse_solver_chunked",
+    "parse_solver_txt_lines",
+    "parse_solver_buffer",
+    "parse_solver_fields",
+    "field_name",
+    "save_fields",
+    "load_fields",
+]
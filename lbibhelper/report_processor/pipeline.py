@@ -0,0 +1,98 @@
+import collections
+import queue
+import threading
+import numpy as np
+from . import render
+from .parser import _read_bytes, parse_solver_buffer
+from .stats import frame_stats
+
+# raw files read ahead of the parsers, per worker
+PREFETCH_DEPTH = 2
+
+
+def prefetch(files, depth=PREFETCH_DEPTH, read=_read_bytes):
+    """Read `files` in a background thread, at most `depth` ahead.
+
+    Yields (file, data) in the order of `files`. The reader blocks while
+    `depth` items wait to be consumed, errors are raised in the consumer.
+    Closing the generator, or an error in the consumer, stops the reader
+    and frees the buffers it holds.
+    """
+    items = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # gives up once the consumer is gone
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for f in files:
+                if not put((f, read(f))):
+                    return
+        except BaseException as e:
+            put(e)
+        put(done)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # drop waiting buffers, the reader returns within one timeout
+        while not items.empty():
+            items.get_nowait()
+        thread.join()
+
+
+def imap_bounded(pool, func, tasks, depth):
+    """`pool.imap` with at most `depth` tasks submitted but not yet consumed.
+
+    Tasks are submitted from the calling thread, so the results of a slow
+    consumer do not pile up and a failing task raises here right away
+    instead of leaving the pool blocked on a free slot. Results come in
+    the order of `tasks`.
+    """
+    pending = collections.deque()
+    for task in tasks:
+        if len(pending) >= max(1, depth):
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (task,)))
+
+    while pending:
+        yield pending.popleft().get()
+
+
+def _pipeline_worker(args):
+    # parse the prefetched bytes, save and render from memory,
+    # `meta` travels back untouched
+    file, buf, size_x, size_y, npy, figname, meta = args
+    mat = parse_solver_buffer(buf, size_x, size_y, file=file)
+    if npy:
+        np.save(npy, mat)
+    if figname:
+        render._renderer.render(mat, figname)
+
+    return file, len(buf), frame_stats(mat), figname, meta
+
+
+__all__ = [
+    "PREFETCH_DEPTH",
+    "prefetch",
+    "imap_bounded",
+]
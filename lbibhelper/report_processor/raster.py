@@ -0,0 +1,69 @@
+import struct
+import zlib
+import numpy as np
+
+# zlib level of write_png, frames are mostly flat colour so a low level
+# compresses almost as well and much faster
+PNG_COMPRESSION = 1
+
+
+def log_index(mat, vmin, vmax, n):
+    """Colour table index of every cell under a log norm from `vmin` to `vmax`.
+
+    Like matplotlib's LogNorm followed by a colormap of `n` colours:
+    values below `vmin` get 0, above `vmax` get n - 1, and values that
+    are not positive get `n`, the "bad" entry of the table.
+
+    Returns
+    -------
+    idx: np.ndarray
+            uint16 array of the shape of `mat`
+    """
+    lo = np.log10(vmin)
+    hi = np.log10(vmax)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.log10(mat)
+    if hi > lo:
+        t -= lo
+        t *= n / (hi - lo)
+    else:
+        t[:] = 0.0
+    np.clip(t, 0, n - 1, out=t)
+
+    bad = ~(mat > 0)
+    t[bad] = 0.0
+    idx = t.astype(np.uint16)
+    idx[bad] = n
+
+    return idx
+
+
+def _png_chunk(tag, data):
+    return (
+        struct.pack(">I", len(data))
+        + tag
+        + data
+        + struct.pack(">I", zlib.crc32(tag + data))
+    )
+
+
+def write_png(filename, rgb, level=PNG_COMPRESSION):
+    """Write an (H, W, 3) uint8 array as an 8 bit RGB PNG, without matplotlib."""
+    height, width, _ = rgb.shape
+    # every scanline starts with its filter type, 0 is none
+    raw = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+    raw[:, 1:] = rgb.reshape(height, -1)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", header))
+        f.write(_png_chunk(b"IDAT", zlib.compress(raw.tobytes(), level)))
+        f.write(_png_chunk(b"IEND", b""))
+
+
+__all__ = [
+    "PNG_COMPRESSION",
+    "log_index",
+    "write_png",
+]
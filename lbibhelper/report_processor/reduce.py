@@ -0,0 +1,157 @@
+import numpy as np
+from .parser import (
+    CHUNK_SIZE,
+    SOLVER_VALUE_COLUMN,
+    _tokenize,
+    iter_blocks,
+    parse_solver_txt_lines,
+)
+
+REDUCTIONS = ("mean", "sum", "max", "min")
+
+
+class _Reducer:
+    # accumulates one (size_x, size_y) grid along `axis` without holding it
+    def __init__(self, size_x, size_y, reduce="mean", axis=0, band=None):
+        if reduce not in REDUCTIONS:
+            raise ValueError(f'Unknown reduction "{reduce}", use one of {REDUCTIONS}')
+        if axis not in (0, 1):
+            raise ValueError("axis should be 0 (over x) or 1 (over y)")
+
+        shape = (size_x, size_y)
+        self.reduce = reduce
+        self.axis = axis
+        self.start, self.stop = band if band else (0, shape[axis])
+        self.n = self.stop - self.start
+        length = shape[1 - axis]
+
+        self.count = np.zeros(length, dtype=np.intp)
+        if reduce in ("mean", "sum"):
+            self.acc = np.zeros(length)
+        elif reduce == "max":
+            self.acc = np.full(length, -np.inf)
+        else:
+            self.acc = np.full(length, np.inf)
+
+    def add_points(self, x, y, c):
+        # scattered grid points, e.g. rows of a solver output
+        along, out = (x, y) if self.axis == 0 else (y, x)
+        keep = (along >= self.start) & (along < self.stop)
+        out, c = out[keep], c[keep]
+
+        self.count += np.bincount(out, minlength=self.count.size)
+        if self.reduce in ("mean", "sum"):
+            self.acc += np.bincount(out, weights=c, minlength=self.acc.size)
+        elif self.reduce == "max":
+            np.maximum.at(self.acc, out, c)
+        else:
+            np.minimum.at(self.acc, out, c)
+
+    def add_line(self, i, line):
+        # row i of the dense grid, reducing over x
+        if not self.start <= i < self.stop:
+            return
+
+        self.count += 1
+        if self.reduce in ("mean", "sum"):
+            self.acc += line
+        elif self.reduce == "max":
+            np.maximum(self.acc, line, out=self.acc)
+        else:
+            np.minimum(self.acc, line, out=self.acc)
+
+    def result(self):
+        acc = self.acc
+        # cells missing from a solver output are 0.0 in the dense grid
+        missing = self.count < self.n
+        if self.reduce == "max":
+            acc = np.where(missing, np.maximum(acc, 0.0), acc)
+        elif self.reduce == "min":
+            acc = np.where(missing, np.minimum(acc, 0.0), acc)
+        elif self.reduce == "mean":
+            acc = acc / max(self.n, 1)
+
+        return acc
+
+
+def reduce_txt(
+    file,
+    size_x,
+    size_y,
+    reduce="mean",
+    axis=0,
+    band=None,
+    column=SOLVER_VALUE_COLUMN,
+):
+    """Reduce a solver output along one axis while streaming the text.
+
+    Same result as ``reduce_array(parse_solver_txt(file, ...), ...)``,
+    without building the grid.
+
+    Parameters
+    ----------
+    file: str
+            Path to the tab separated solver output
+    size_x, size_y: int
+            LB grid size
+    reduce: str, optional
+            One of "mean", "sum", "max" or "min"
+    axis: int, optional
+            0 reduces over x giving a profile along y, 1 over y
+    band: tuple, optional
+            (start, stop) range along `axis` to reduce over, all by default
+
+    Returns
+    -------
+    profile: np.ndarray
+            Reduced profile of length size_y (axis=0) or size_x (axis=1)
+    """
+    reducer = _Reducer(size_x, size_y, reduce, axis, band)
+
+    try:
+        for block in iter_blocks(file, CHUNK_SIZE):
+            rows = _tokenize(block, usecols=(0, 1, column))
+            reducer.add_points(
+                rows[:, 0].astype(np.intp), rows[:, 1].astype(np.intp), rows[:, 2]
+            )
+    except (ValueError, UnicodeDecodeError):
+        mat = parse_solver_txt_lines(file, size_x, size_y, column)
+        return reduce_array(mat, reduce, axis, band)
+
+    return reducer.result()
+
+
+def reduce_array(mat, reduce="mean", axis=0, band=None):
+    """Reduce a (size_x, size_y) array one row at a time.
+
+    `mat` may be a memory map, e.g. from ``np.load(npy, mmap_mode="r")``
+    or a timestep of the solver store, only one row is paged in at once.
+    Arguments are the same as for `reduce_txt`.
+    """
+    reducer = _Reducer(mat.shape[0], mat.shape[1], reduce, axis, band)
+
+    if axis == 1:
+        # every row reduces to a single value
+        func = getattr(np, reduce)
+        band = slice(reducer.start, reducer.stop)
+        return np.array(
+            [func(np.asarray(mat[x, band], dtype=float)) for x in range(len(mat))]
+        )
+
+    for x in range(reducer.start, reducer.stop):
+        reducer.add_line(x, np.asarray(mat[x], dtype=float))
+
+    return reducer.result()
+
+
+def reduce_npy(npy, reduce="mean", axis=0, band=None):
+    """`reduce_array` over a memory-mapped .npy file."""
+    return reduce_array(np.load(npy, mmap_mode="r"), reduce, axis, band)
+
+
+__all__ = [
+    "REDUCTIONS",
+    "reduce_txt",
+    "reduce_array",
+    "reduce_npy",
+]
@@ -0,0 +1,334 @@
+import copy
+from collections import namedtuple
+import numpy as np
+from lbibhelper.core.plot import get_inch_from_pts, get_pyplot, tex_fonts
+from .raster import log_index, write_png
+
+PREVIEW_SIZE = 400
+PREVIEW_DPI = 72
+
+# one frame to draw: load(*load_args) is saved to figname, if any, and also
+# returned as RGB if rgb is set, scale is (shift, vmin, vmax) or None for
+# the scale of the renderer
+FrameTask = namedtuple("FrameTask", ["load", "load_args", "figname", "rgb", "scale"])
+
+
+def downsample(mat, size, pool="mean"):
+    """Block-reduce `mat` so that no side is longer than `size`.
+
+    Blocks are square, the last block along an axis may be smaller.
+
+    Parameters
+    ----------
+    mat: np.ndarray
+            2D array
+    size: int
+            Longest side of the result
+    pool: str, optional
+            "mean" averages a block, "max" keeps its maximum
+
+    Returns
+    -------
+    small: np.ndarray
+            Reduced array, `mat` itself if it is small enough already
+    """
+    factor = int(np.ceil(max(mat.shape) / size))
+    if factor <= 1:
+        return mat
+
+    idx_x = np.arange(0, mat.shape[0], factor)
+    idx_y = np.arange(0, mat.shape[1], factor)
+    if pool == "max":
+        return np.maximum.reduceat(np.maximum.reduceat(mat, idx_x, 0), idx_y, 1)
+    elif pool == "mean":
+        total = np.add.reduceat(np.add.reduceat(mat, idx_x, 0), idx_y, 1)
+        n_x = np.diff(np.append(idx_x, mat.shape[0]))
+        n_y = np.diff(np.append(idx_y, mat.shape[1]))
+        return total / np.outer(n_x, n_y)
+
+    raise ValueError(f'Unknown pooling "{pool}", use "mean" or "max"')
+
+
+class FrameRenderer:
+    """Solver frame figure built once and reused for every timestep.
+
+    Axes, colorbar divider and mappable are created on the first frame,
+    later frames only swap the image data with `set_data`. The saved
+    PNGs are the same as the ones from `plot_solver_matrix`.
+
+    Parameters
+    ----------
+    shift: float
+            Added to every matrix before LogNorm, to get rid of 0.0
+    vmin, vmax: float, optional
+            Colour scale, the range of each frame if not given
+    rcParams: bool, optional
+            Use LaTeX fonts
+    preview: int, optional
+            Fast preview: block-reduce frames to at most `preview` cells per
+            side, save at PREVIEW_DPI and skip the tight bounding box
+    pool: str, optional
+            Block reduction of the preview, "mean" or "max"
+    """
+
+    aspect = 20
+    pad_fraction = 0.5
+    cmap = "coolwarm"
+
+    def __init__(
+        self, shift, vmin=None, vmax=None, rcParams=None, preview=None, pool="mean"
+    ):
+        self.shift = shift
+        self.vmin = vmin
+        self.vmax = vmax
+        self.rcParams = rcParams
+        self.preview = preview
+        self.pool = pool
+        self.fig = None
+        self.shape = None
+
+    def _build(self, mat, vmin, vmax, shape):
+        import matplotlib as mpl
+        from matplotlib import cm
+        from mpl_toolkits.axes_grid1 import make_axes_locatable, axes_size
+
+        plt = get_pyplot()
+        width_to_height = shape[0] / shape[1]
+
+        self.norm = mpl.colors.LogNorm(vmin=vmin, vmax=vmax)
+        self.mappable = cm.ScalarMappable(norm=self.norm, cmap=self.cmap)
+
+        # use latex font
+        height = get_inch_from_pts(345)
+        width = height * width_to_height + 2
+        if self.rcParams:
+            mpl.rcParams.update(tex_fonts)
+
+        if self.preview:
+            # keep axes in LBM units for the block-reduced matrix
+            extent = (-0.5, shape[0] - 0.5, -0.5, shape[1] - 0.5)
+            self.fig = plt.figure(figsize=(width, height), dpi=PREVIEW_DPI)
+        else:
+            extent = None
+            self.fig = plt.figure(figsize=(width, height))
+        ax = self.fig.gca()
+        # (300, 1000) interpreted as 300 rows and 1000 column
+        self.img = ax.imshow(
+            mat.T, norm=self.norm, cmap=self.cmap, origin="lower", extent=extent
+        )
+        ax.set_xlabel("X (LBM unit)")
+        ax.set_ylabel("Y (LBM unit)")
+        ax.grid(False)
+        # create an axes on the right side of ax. The width of cax will be 5%
+        # of ax and the padding between cax and ax will be fixed at 0.05 inch.
+        divider = make_axes_locatable(ax)
+        width = axes_size.AxesY(ax, aspect=1.0 / self.aspect)
+        pad = axes_size.Fraction(self.pad_fraction, width)
+        cax = divider.append_axes("right", size=width, pad=pad)
+        self.cbar = self.fig.colorbar(self.mappable, cax=cax)
+        self.cbar.set_label("Shh gradient (LogNorm)")
+        self.ax = ax
+        self.shape = shape
+
+    def _prepare(self, mat):
+        # preview reduction, shift and colour scale of a frame
+        if self.preview:
+            mat = downsample(mat, self.preview, self.pool)
+        mat = mat + self.shift
+
+        vmin, vmax = self.vmin, self.vmax
+        if not vmin and not vmax:
+            vmin = np.min(mat)
+            vmax = np.max(mat)
+
+        return mat, vmin, vmax
+
+    def draw(self, mat):
+        """Put `mat` on the figure, returns the figure."""
+        shape = mat.shape
+        mat, vmin, vmax = self._prepare(mat)
+
+        if self.fig is None or shape != self.shape:
+            self.close()
+            self._build(mat, vmin, vmax, shape)
+            return self.fig
+
+        self.img.set_data(mat.T)
+        if (vmin, vmax) != (self.norm.vmin, self.norm.vmax):
+            self.norm.vmin = vmin
+            self.norm.vmax = vmax
+            self.cbar.update_normal(self.mappable)
+
+        return self.fig
+
+    def render(self, mat, figname):
+        """Draw `mat` and save it as `figname`."""
+        fig = self.draw(mat)
+        if self.preview:
+            fig.savefig(figname, dpi=PREVIEW_DPI, transparent=False)
+        else:
+            fig.savefig(figname, dpi=300, transparent=False, bbox_inches="tight")
+
+    def to_rgb(self, mat):
+        """Draw `mat` and return the canvas as an (H, W, 3) uint8 array."""
+        fig = self.draw(mat)
+        fig.canvas.draw()
+
+        return np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
+
+    def close(self):
+        if self.fig is not None:
+            get_pyplot().close(self.fig)
+            self.fig = None
+
+
+class RasterRenderer(FrameRenderer):
+    """FrameRenderer that only uses matplotlib to draw a frame template.
+
+    Axes, labels and colorbar are drawn once into an RGB template with an
+    empty image. Every frame is coloured in NumPy, log norm and a lookup
+    table of the colormap, and pasted into the image area of the template,
+    then written by `write_png`. The template is redrawn only when the grid
+    shape or the colour scale changes, so frames on a global scale cost a
+    table lookup and the PNG encoding instead of a full figure draw.
+
+    Images are nearest-neighbour resampled and cropped like
+    ``bbox_inches="tight"``, close to but not pixel-identical with the
+    PNGs of `FrameRenderer`. Parameters are the same.
+    """
+
+    # the empty image is drawn in both colours, pixels that differ belong
+    # to a frame, also the ones blended with the spines
+    keys = ((255, 0, 255), (0, 255, 0))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # templates of saved PNGs (True) and of to_rgb (False)
+        self.templates = {}
+        self.template_key = None
+
+    def _build_template(self, mat, vmin, vmax, shape, png):
+        import matplotlib as mpl
+
+        self._build(np.ma.masked_all(mat.shape), vmin, vmax, shape)
+
+        # same resolution as FrameRenderer.render and .to_rgb
+        dpi = PREVIEW_DPI if self.preview or not png else 300
+        if png:
+            self.fig.set_dpi(dpi)
+        canvas = self.fig.canvas
+        base = self.img.get_cmap()
+        drawn = []
+        for key in self.keys:
+            bad = np.divide(key, 255)
+            if hasattr(base, "with_extremes"):
+                cmap = base.with_extremes(bad=bad)
+            else:
+                # matplotlib < 3.4
+                cmap = copy.copy(base)
+                cmap.set_bad(bad)
+            self.img.set_cmap(cmap)
+            canvas.draw()
+            drawn.append(np.asarray(canvas.buffer_rgba())[..., :3].copy())
+        renderer = canvas.get_renderer()
+        rgb = drawn[0]
+        height = rgb.shape[0]
+
+        # (left, top, right, bottom) in pixels from the top left corner
+        ext = self.ax.get_window_extent(renderer)
+        box = np.array([ext.x0, height - ext.y1, ext.x1, height - ext.y0])
+        crop = np.array([0, 0, rgb.shape[1], height])
+        if png and not self.preview:
+            tight = self.fig.get_tightbbox(renderer)
+            tight = tight.padded(mpl.rcParams["savefig.pad_inches"]).extents * dpi
+            crop = np.array([tight[0], height - tight[3], tight[2], height - tight[1]])
+            crop = np.clip(np.round(crop), 0, [rgb.shape[1], height] * 2).astype(int)
+        crop_rows = slice(crop[1], crop[3])
+        crop_cols = slice(crop[0], crop[2])
+        template = rgb[crop_rows, crop_cols]
+        other = drawn[1][crop_rows, crop_cols]
+        box -= np.tile(crop[:2], 2)
+
+        c0, r0 = np.floor(box[:2]).astype(int)
+        c1, r1 = np.ceil(box[2:]).astype(int)
+        region = (slice(r0, r1), slice(c0, c1))
+        # pixels of the image area left alone by the image, the spines, are
+        # put back from the template after pasting a frame
+        keep = np.nonzero((template[region] == other[region]).all(axis=-1))
+
+        # cell under the centre of every pixel, the image is mat.T, origin lower
+        cols = (np.arange(c0, c1) + 0.5 - box[0]) / (box[2] - box[0]) * mat.shape[0]
+        rows = (np.arange(r0, r1) + 0.5 - box[1]) / (box[3] - box[1]) * mat.shape[1]
+        cols = np.clip(cols.astype(int), 0, mat.shape[0] - 1)
+        rows = mat.shape[1] - 1 - np.clip(rows.astype(int), 0, mat.shape[1] - 1)
+
+        # colour table with the axes background as "bad" entry, see log_index
+        base = self.mappable.get_cmap()
+        bad = mpl.colors.to_rgba(self.ax.get_facecolor())
+        lut = np.vstack(
+            [base(np.arange(base.N), bytes=True)[:, :3], np.multiply(bad[:3], 255)]
+        )
+        self.close()
+
+        return template, region, keep, rows, cols, lut.round().astype(np.uint8)
+
+    def _raster(self, mat, png):
+        shape = mat.shape
+        mat, vmin, vmax = self._prepare(mat)
+        if (shape, vmin, vmax) != self.template_key:
+            self.templates = {}
+            self.template_key = (shape, vmin, vmax)
+        if png not in self.templates:
+            self.templates[png] = self._build_template(mat, vmin, vmax, shape, png)
+        template, region, keep, rows, cols, lut = self.templates[png]
+
+        # colour the grid, then pick the cell of every pixel
+        colours = lut[log_index(mat, vmin, vmax, len(lut) - 1).T]
+        frame = template.copy()
+        frame[region] = colours.take(rows, axis=0).take(cols, axis=1)
+        frame[region][keep] = template[region][keep]
+
+        return frame
+
+    def to_rgb(self, mat):
+        """`mat` on the template as an (H, W, 3) uint8 array."""
+        return self._raster(mat, False)
+
+    def render(self, mat, figname):
+        """Raster `mat` and save it as `figname`."""
+        write_png(figname, self._raster(mat, True))
+
+
+# one renderer per worker process, see SolverProcessor.plot_solver
+_renderer = None
+
+
+def _init_worker(shift, vmin, vmax, rcParams, preview=None, pool="mean", raster=False):
+    global _renderer
+    renderer = RasterRenderer if raster else FrameRenderer
+    _renderer = renderer(shift, vmin, vmax, rcParams, preview, pool)
+
+
+def _close_worker():
+    _renderer.close()
+
+
+def _render_worker(task):
+    load, load_args, figname, rgb, scale = task
+    if scale is not None:
+        _renderer.shift, _renderer.vmin, _renderer.vmax = scale
+    mat = load(*load_args)
+    if figname:
+        _renderer.render(mat, figname)
+
+    frame = _renderer.to_rgb(mat) if rgb else None
+
+    return figname, frame
+
+
+__all__ = [
+    "FrameRenderer",
+    "FrameTask",
+    "RasterRenderer",
+    "downsample",
+]
@@ -0,0 +1,135 @@
+import numpy as np
+
+# log10 range and resolution of the histogram sketch, values outside the
+# range are counted in the first or last bin
+HIST_LOG_MIN = -30
+HIST_LOG_MAX = 10
+HIST_BINS_PER_DECADE = 20
+
+
+class LogHistogram:
+    """Histogram of positive values on fixed log-spaced bins.
+
+    All sketches share the same bins, so the sketches of single frames,
+    files or worker processes are merged by adding them up. Zeros and
+    negative values are only counted. Quantiles are exact to one bin,
+    a factor of 10 ** (1 / HIST_BINS_PER_DECADE).
+    """
+
+    n_bins = (HIST_LOG_MAX - HIST_LOG_MIN) * HIST_BINS_PER_DECADE
+
+    def __init__(self, counts=None, zero=0, negative=0):
+        if counts is None:
+            counts = np.zeros(self.n_bins, dtype=np.int64)
+        self.counts = counts
+        self.zero = zero
+        self.negative = negative
+
+    @classmethod
+    def from_values(cls, values):
+        hist = cls()
+        hist.add(values)
+        return hist
+
+    def add(self, values):
+        """Count the values of an array of any shape."""
+        values = np.asarray(values).ravel()
+        positive = values[values > 0]
+        self.zero += int(np.count_nonzero(values == 0))
+        self.negative += int(np.count_nonzero(values < 0))
+
+        idx = np.floor((np.log10(positive) - HIST_LOG_MIN) * HIST_BINS_PER_DECADE)
+        idx = np.clip(idx, 0, self.n_bins - 1).astype(np.intp)
+        self.counts += np.bincount(idx, minlength=self.n_bins)
+
+    def __iadd__(self, other):
+        self.counts += other.counts
+        self.zero += other.zero
+        self.negative += other.negative
+        return self
+
+    def __add__(self, other):
+        res = LogHistogram(self.counts.copy(), self.zero, self.negative)
+        res += other
+        return res
+
+    @property
+    def n_positive(self):
+        return int(self.counts.sum())
+
+    def edges(self):
+        """Bin edges, n_bins + 1 values."""
+        return np.logspace(HIST_LOG_MIN, HIST_LOG_MAX, self.n_bins + 1)
+
+    def quantile(self, q):
+        """Approximate `q` quantile (0 to 1) of the positive values.
+
+        Interpolated geometrically inside the bin, None without values.
+        """
+        total = self.n_positive
+        if total == 0:
+            return None
+
+        cum = np.cumsum(self.counts)
+        target = min(max(q, 0.0), 1.0) * total
+        # q = 0 would land in the empty bins below the lowest value
+        i = int(np.searchsorted(cum, target, side="left"))
+        i = min(max(i, np.flatnonzero(self.counts)[0]), self.n_bins - 1)
+        before = cum[i - 1] if i > 0 else 0
+        frac = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        frac = min(max(frac, 0.0), 1.0)
+
+        log = HIST_LOG_MIN + (i + frac) / HIST_BINS_PER_DECADE
+        return float(10**log)
+
+    def percentile(self, p):
+        """`quantile` with `p` in percent."""
+        return self.quantile(p / 100)
+
+    def min_positive(self):
+        """Lower edge of the lowest occupied bin, None without values."""
+        occupied = np.flatnonzero(self.counts)
+        if occupied.size == 0:
+            return None
+
+        return float(10 ** (HIST_LOG_MIN + occupied[0] / HIST_BINS_PER_DECADE))
+
+    def to_dict(self):
+        # only occupied bins, a frame rarely spans more than a few decades
+        occupied = np.flatnonzero(self.counts)
+        return {
+            "zero": self.zero,
+            "negative": self.negative,
+            "index": occupied.tolist(),
+            "count": self.counts[occupied].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        counts = np.zeros(cls.n_bins, dtype=np.int64)
+        counts[d["index"]] = d["count"]
+        return cls(counts, d["zero"], d["negative"])
+
+
+def merge_histograms(stats):
+    """Sum of the "hist" sketches of per-timestep `stats`.
+
+    None if a timestep has no sketch, e.g. converted by an older version.
+    """
+    if not stats or any("hist" not in s for s in stats.values()):
+        return None
+
+    hist = LogHistogram()
+    for s in stats.values():
+        hist += LogHistogram.from_dict(s["hist"])
+
+    return hist
+
+
+__all__ = [
+    "HIST_LOG_MIN",
+    "HIST_LOG_MAX",
+    "HIST_BINS_PER_DECADE",
+    "LogHistogram",
+    "merge_histograms",
+]
@@ -1,22 +1,58 @@
 from genericpath import exists
+import contextlib
+import functools
 import os
+from collections import namedtuple
+import multiprocessing
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-from matplotlib import cm
-from mpl_toolkits.axes_grid1 import make_axes_locatable, axes_size
 from lbibhelper.core.settings import *
-from lbibhelper.core.plot import get_inch_from_pts, tex_fonts
-from .video import png_to_gif
-
-
-if get_os_name() == "linux":
-    plt.switch_backend("Agg")
+from lbibhelper.core.settings import default_num_threads
+from lbibhelper.core.instrument import RunReport, print_progress
+from lbibhelper.core.plot import get_pyplot
+from .video import AnimationWriter, png_to_gif
+from .render import (
+    PREVIEW_SIZE,
+    FrameRenderer,
+    FrameTask,
+    _close_worker,
+    _init_worker,
+    _render_worker,
+)
+from .parser import load_fields, parse_solver_fields, parse_solver_txt, save_fields
+from .pipeline import PREFETCH_DEPTH, _pipeline_worker, imap_bounded, prefetch
+from .timesteps import TimestepIndex
+from .reduce import reduce_array, reduce_npy, reduce_txt
+from .sparse import SPARSE_SUFFIX, load_sparse, save_sparse
+from .sketch import merge_histograms
+from .stats import STATS_FILENAME, frame_stats, global_range, load_stats, save_stats
+from .store import STORE_FILENAME, create_store, open_store
+from .manifest import (
+    CONVERTED,
+    MANIFEST_FILENAME,
+    RENDERED,
+    file_signature,
+    is_changed,
+    load_manifest,
+    save_manifest,
+)
 
 
 SOLVER_FN_TEMPLATE = "%06d.png"
 SOLVER_DIR = "solver"
+PREVIEW_DIR = "solver_preview"
 SHIFT = 1e-10
+FIELDS_SUFFIX = "_fields.npz"
+REPORT_FILENAME = "solver_report.json"
+
+# conversion of one text output, see SolverProcessor.conversion_tasks
+ConvertTask = namedtuple(
+    "ConvertTask", ["file", "size_x", "size_y", "store", "t", "hash", "sparse"]
+)
+# reduced profile of one timestep, see SolverProcessor.profile_task
+ProfileTask = namedtuple(
+    "ProfileTask",
+    ["file", "size_x", "size_y", "store", "t", "sig", "reduce", "axis", "band"],
+)
 
 
 def plot_solver_matrix(
@@ -25,106 +61,266 @@ def plot_solver_matrix(
     # TODO: fix LogNorm issue: now shifting by SHIFT to avoid issue with 0.0
     # TODO: ticks and label formatting for colobar
     # https://stackoverflow.com/questions/35728665/matplotlib-colorbar-tick-label-formatting
-    try:
-        mat = np.load(filename)
-    except IOError:
-        raise IOError(f'Solver output: "{filename}" cannot be opened')
-
-    aspect = 20
-    pad_fraction = 0.5
-    width_to_height = mat.shape[0] / mat.shape[1]
-
-    mat += shift
-
-    if not vmin and not vmax:
-        vmin = np.min(mat)
-        vmax = np.max(mat)
-    norm = mpl.colors.LogNorm(vmin=vmin, vmax=vmax)
-    cmap = "coolwarm"
-    mappable = cm.ScalarMappable(norm=norm, cmap="coolwarm")
-
-    # use latex font
-    height = get_inch_from_pts(345)
-    width = height * width_to_height + 2
-    if rcParams:
-        mpl.rcParams.update(tex_fonts)
-
-    fig = plt.figure(figsize=(width, height))
-    ax = plt.gca()
-    # img = ax.pcolor(X, Y, mat.T, norm=norm, cmap=cmap)
-    # (300, 1000) interpreted as 300 rows and 1000 column
-    img = ax.imshow(mat.T, norm=norm, cmap=cmap, origin="lower")
-    ax.set_xlabel("X (LBM unit)")
-    ax.set_ylabel("Y (LBM unit)")
-    ax.grid(False)
-    # create an axes on the right side of ax. The width of cax will be 5%
-    # of ax and the padding between cax and ax will be fixed at 0.05 inch.
-    divider = make_axes_locatable(ax)
-    width = axes_size.AxesY(ax, aspect=1.0 / aspect)
-    pad = axes_size.Fraction(pad_fraction, width)
-    cax = divider.append_axes("right", size=width, pad=pad)
-    cbar = plt.colorbar(mappable, cax=cax)
-    cbar.set_label("Shh gradient (LogNorm)")
-    # plt.tight_layout()
+    if isinstance(filename, np.ndarray):
+        mat = filename
+    else:
+        try:
+            mat = np.load(filename)
+        except IOError:
+            raise IOError(f'Solver output: "{filename}" cannot be opened')
 
+    renderer = FrameRenderer(shift, vmin, vmax, rcParams)
     if figname:
-        plt.savefig(figname, dpi=300, transparent=False, bbox_inches="tight")
-        plt.close(fig)
+        renderer.render(mat, figname)
+        renderer.close()
+    else:
+        renderer.draw(mat)
+
+
+def plot_kymograph(kymo, figname, names=None):
+    plt = get_pyplot()
+    fig, ax = plt.subplots()
+    img = ax.imshow(kymo, aspect="auto", origin="lower", cmap="coolwarm")
+    ax.set_xlabel("Position (LBM unit)")
+    ax.set_ylabel("Timestep")
+    if names:
+        ticks = np.linspace(0, len(names) - 1, min(len(names), 6)).astype(int)
+        ax.set_yticks(ticks)
+        ax.set_yticklabels([names[i] for i in ticks])
+    fig.colorbar(img, ax=ax).set_label("Shh gradient")
+    fig.savefig(figname, dpi=300, transparent=False, bbox_inches="tight")
+    plt.close(fig)
 
 
 def _get_np_from_txt(file, size_x, size_y):
-    mat = np.zeros((size_x, size_y), dtype=float)
+    return parse_solver_txt(file, size_x, size_y)
+
+
+def _convert_txt(args):
+    # worker for SolverProcessor.save_npy, must stay picklable
+    file, size_x, size_y, store, t, hash, sparse = args
+    filename, _ = os.path.splitext(file)
+
+    # signature before parsing, a file rewritten meanwhile is caught next time
+    sig = file_signature(file, hash)
+    sig["store"] = bool(store)
+
+    if store:
+        # parsed straight into the memory mapped store, no extra grid
+        target = np.lib.format.open_memmap(store, mode="r+")
+        stats = frame_stats(parse_solver_txt(file, size_x, size_y, out=target[t]))
+        target.flush()
+        del target
+    else:
+        mat = _get_np_from_txt(file, size_x, size_y)
+        _save_frame(filename, mat, sparse)
+        stats = frame_stats(mat)
+
+    return file, stats, sig
+
+
+def _save_frame(filename, mat, sparse=False):
+    # Cells_N.npy, or Cells_N_sparse.npz if the frame is mostly empty,
+    # the other one is removed so it cannot be picked up stale
+    npy = filename + ".npy"
+    npz = filename + SPARSE_SUFFIX
+    if sparse and save_sparse(npz, mat):
+        stale = npy
+    else:
+        np.save(npy, mat)
+        stale = npz
+
+    if os.path.isfile(stale):
+        os.remove(stale)
+
+
+def _load_frame(file, sig=None):
+    # fresh .npy or compacted frame of a text output, None if there is none
+    filename, _ = os.path.splitext(file)
+    npy = filename + ".npy"
+    if _is_fresh(npy, file, sig):
+        return np.load(npy)
+
+    npz = filename + SPARSE_SUFFIX
+    if _is_fresh(npz, file, sig):
+        return load_sparse(npz)
+
+    return None
+
+
+def _convert_fields(args):
+    # worker for SolverProcessor.save_fields
+    file, size_x, size_y, dtype, compress = args
+    filename, _ = os.path.splitext(file)
+
+    fields = parse_solver_fields(file, size_x, size_y, dtype)
+    save_fields(filename + FIELDS_SUFFIX, fields, compress)
+
+    return file
+
+
+def _reduce_solver_mat(args):
+    # worker for SolverProcessor.kymograph, same source order as _load_solver_mat
+    file, size_x, size_y, store, t, sig, reduce, axis, band = args
+    npy = "{:s}.npy".format(os.path.splitext(file)[0])
+    if _is_fresh(npy, file, sig):
+        return reduce_npy(npy, reduce, axis, band)
+
+    npz = "{:s}{:s}".format(os.path.splitext(file)[0], SPARSE_SUFFIX)
+    if _is_fresh(npz, file, sig):
+        return reduce_array(load_sparse(npz), reduce, axis, band)
+
+    if store is not None:
+        return reduce_array(np.load(store, mmap_mode="r")[t], reduce, axis, band)
+
+    return reduce_txt(file, size_x, size_y, reduce, axis, band)
+
+
+def run_task(task):
+    """Run a ConvertTask, ProfileTask or FrameTask, also in a worker process.
+
+    A ConvertTask returns (file, stats, signature) for
+    `SolverProcessor.add_converted`, a ProfileTask the reduced profile and
+    a FrameTask (figname, rgb frame), it needs a renderer set up by the
+    pool initializer of `render`.
+    """
+    return _TASK_WORKERS[type(task)](task)
+
+
+_TASK_WORKERS = {
+    ConvertTask: _convert_txt,
+    ProfileTask: _reduce_solver_mat,
+    FrameTask: _render_worker,
+}
+
+
+def _read_signed(file, hash=False):
+    # signature taken before reading, like in _convert_txt
+    sig = file_signature(file, hash)
+    with open(file, "rb") as f:
+        return sig, f.read()
+
 
+def _render_record(source, scale, raster=False):
+    # manifest record of a rendered frame
+    record = {"source": source, "scale": scale}
+    if raster:
+        record["raster"] = True
+
+    return record
+
+
+def _get_name(file):
+    # Cells_100 for .../Cells_100.txt
+    return os.path.splitext(os.path.basename(file))[0]
+
+
+def _is_fresh(npy, file, sig=None):
+    # .npy exists and the text file is unchanged since its conversion, per
+    # the manifest record `sig` (touched files checked with hash=True count
+    # as unchanged) or else by mtime
+    if not os.path.isfile(npy):
+        return False
+    if sig and not sig.get("store") and not is_changed(file, sig):
+        return True
+
+    return os.path.getmtime(npy) >= os.path.getmtime(file)
+
+
+# CONVERTED section of the manifests read by _converted_record, by manifest
+# path, with the (mtime, size) they were read at
+_converted_cache = {}
+
+
+def _converted_record(file):
+    # manifest record of a text output, None if it was never converted,
+    # a manifest is only parsed again once it was rewritten
+    directory = os.path.dirname(os.path.abspath(file))
+    filename = os.path.join(directory, MANIFEST_FILENAME)
     try:
-        f_out = open(file, "r")
-    except IOError:
-        raise IOError(f'"{file}" does not exist or cannot be createed.')
+        st = os.stat(filename)
+    except OSError:
+        _converted_cache.pop(filename, None)
+        return None
+
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _converted_cache.get(filename)
+    if cached is None or cached[0] != key:
+        cached = key, load_manifest(filename)[CONVERTED]
+        _converted_cache[filename] = cached
 
-    for line in f_out.readlines():
-        line_list = line.rstrip("\n").split("\t")
-        x = int(line_list[0])
-        y = int(line_list[1])
-        c = float(line_list[5])
-        mat[x, y] = c
+    return cached[1].get(_get_name(file))
 
-    f_out.close()
 
+def _load_solver_mat(file, size_x, size_y, store=None, t=None, sig=None):
+    # fresh .npy (or compacted frame) first, then the store, otherwise
+    # convert the text file
+    mat = _load_frame(file, sig)
+    if mat is not None:
+        return mat
+
+    if store is not None:
+        return np.array(np.load(store, mmap_mode="r")[t])
+
+    mat = _get_np_from_txt(file, size_x, size_y)
+    np.save("{:s}.npy".format(os.path.splitext(file)[0]), mat)
     return mat
 
 
 def _get_size(file):
-    last_line = readlast(file)
-    line_list = last_line.rstrip("\n").split("\t")
+    # grid is written row by row, the last line holds the largest x and y
+    _, last_line, _ = read_first_last(file)
+    line_list = last_line.split("\t")
 
     size_x = int(line_list[0]) + 1
     size_y = int(line_list[1]) + 1
 
-    print("LB grid: {:d} X {:d}".format(size_x, size_y))
-
     return size_x, size_y
 
 
 def get_solver_mat(file, flatten=False):
     filename, _ = os.path.splitext(file)
     npy = "{:s}.npy".format(filename)
-    if os.path.isfile(npy):
-        mat = np.load(npy)
-    else:
-        print("sdasd")
+    sig = _converted_record(file)
+    if flatten:
+        # mean along y axis, average over x = [1, 1000]
+        # streamed one row at a time, the full matrix is never built
+        if _is_fresh(npy, file, sig):
+            return reduce_npy(npy)
+        mat = _load_frame(file, sig)
+        if mat is not None:
+            return reduce_array(mat)
+        size_x, size_y = _get_size(file)
+        return reduce_txt(file, size_x, size_y)
+
+    # compacted frames are densified transparently
+    mat = _load_frame(file, sig)
+    if mat is None:
         size_x, size_y = _get_size(file)
         mat = _get_np_from_txt(file, size_x, size_y)
         np.save(npy, mat)
 
-    if flatten:
-        # mean along y axis, average over x = [1, 1000]
-        return np.mean(mat, axis=0)
-
     return mat
 
 
 class SolverProcessor:
-    def __init__(self, output_dir):
+    """Convert, plot and reduce the solver output of one LBIBCell run.
+
+    Parameters
+    ----------
+    output_dir: str
+            LBIBCell output directory with Cells_N.txt
+    report: RunReport, optional
+            Collects timings and counters of every stage, a new one by default
+    verbose: bool, optional
+            Print progress to stderr when no `report` is given
+    """
+
+    def __init__(self, output_dir, report=None, verbose=True):
         self.directory = output_dir
+        if report is None:
+            report = RunReport([print_progress] if verbose else None)
+        self.report = report
         try:
             check_exists(output_dir)
         except FileNotFoundError:
@@ -138,9 +334,8 @@ class SolverProcessor:
             raise FileNotFoundError(
                 f'"{output_dir}" does not exist. Try initilize with correct directory.'
             )
-        n_txt = len(self.get_solver_txt())
-        if n_txt > 30:
-            print(f"Dealing with {n_txt} files, please be patient :)")
+        self.report.info["directory"] = output_dir
+        self.report.info["outputs"] = len(self.solver_txt)
 
         self.solver_directory = os.path.join(self.directory, SOLVER_DIR)
         try:
@@ -153,89 +348,487 @@ class SolverProcessor:
         # uniform scale for later during plotting
         self.vmin = 0.0
         self.vmax = 0.0
+        self.histogram = None
         self.size_x, self.size_y = self.get_size()
+        self.report.info["grid"] = [self.size_x, self.size_y]
+
+        # per-timestep statistics from an earlier conversion
+        self.stats_file = os.path.join(self.directory, STATS_FILENAME)
+        self.stats = load_stats(self.stats_file)
+        self._update_scale()
+
+        # consolidated (T, X, Y) store, opened on first access
+        self.store_file = os.path.join(self.directory, STORE_FILENAME)
+        self._store = None
+
+        # source signatures of converted and rendered timesteps
+        self.manifest_file = os.path.join(self.directory, MANIFEST_FILENAME)
+        self.manifest = load_manifest(self.manifest_file)
 
     def get_solver_directory(self):
         return self.solver_directory
 
     def verify_solver_output(self):
-        # TODO: add support for other cases of solver output like Cells_solver_100.txt
-        lst = []
-        for file in os.listdir(self.directory):
-            if file == "log.txt":
-                continue
-            elif file.endswith(".txt"):
-                lst.append(file)
-
-        if len(lst) == 0:
+        # Cells_100.txt or Cells_solver_100.txt, sorted by step
+        self.index = TimestepIndex(self.directory)
+        if len(self.index) == 0:
             raise FileNotFoundError(
                 f"No solver output like Cells_100.txt in {self.directory}"
             )
 
-        print("{:d} solver output in {:s}".format(len(lst), self.directory))
-
-        return lst
+        return self.index.files
 
     def get_solver_txt(self):
-        return [os.path.join(self.directory, f) for f in self.solver_txt]
+        return self.index.paths()
+
+    def select(self, steps=None):
+        """Names of the solver outputs a stage works on, all by default.
+
+        `steps` is a slice over steps, e.g. ``slice(5000, None, 10)`` for
+        every 10th output from step 5000 on, a list of steps or a
+        `TimestepIndex`.
+        """
+        if steps is None:
+            return self.index.files
+        if isinstance(steps, TimestepIndex):
+            return steps.files
+        if isinstance(steps, slice):
+            return self.index[steps].files
+
+        return [self.index[step] for step in steps]
 
     def get_size(self):
-        # TODO: add support for other cases of solver output like Cells_solver_100.txt
-        # one should always have the first solver output
-        cell_0_solver = os.path.join(self.directory, "Cells_0.txt")
+        # the first solver output spans the whole grid like any other
+        return _get_size(self.index.paths()[0])
 
-        return _get_size(cell_0_solver)
+    def get_store(self):
+        """Memory-mapped (T, X, Y) store and its timestep names.
+
+        Returns (None, []) if the run was not converted with store=True.
+        """
+        if self._store is None:
+            try:
+                self._store = open_store(self.store_file)
+            except FileNotFoundError:
+                return None, []
+
+        return self._store
+
+    def __getitem__(self, key):
+        # lazy slicing over the store, e.g. proc[t] or proc[t0:t1, x, :]
+        store, _ = self.get_store()
+        if store is None:
+            raise FileNotFoundError(
+                f'No solver store in "{self.directory}", run save_npy(store=True)'
+            )
+
+        return store[key]
+
+    def time_series(self, x, y):
+        """Value of one grid cell over all timesteps in the store."""
+        return np.array(self[:, x, y])
 
     def get_solver_mat(self, file):
         # TODO: get support for both case
         full_file = os.path.join(self.directory, file)
-        filename, _ = os.path.splitext(file)
-        npy = os.path.join(self.directory, "{:s}.npy".format(filename))
-        if os.path.isfile(npy):
-            mat = np.load(npy)
+        return _load_solver_mat(
+            full_file, self.size_x, self.size_y, *self._locate(file)
+        )
+
+    def _locate(self, file):
+        # (store file, index) of a timestep still up to date in the store and
+        # its manifest record, which decides if its .npy is fresh
+        full_file = os.path.join(self.directory, file)
+        name = _get_name(file)
+        _, names = self.get_store()
+        sig = self.manifest[CONVERTED].get(name)
+        if name in names and sig and sig.get("store"):
+            if not is_changed(full_file, sig):
+                return self.store_file, names.index(name), sig
+
+        return None, None, sig
+
+    def save_npy(
+        self,
+        jobs=default_num_threads,
+        store=False,
+        only_changed=False,
+        hash=False,
+        steps=None,
+        sparse=False,
+    ):
+        """Convert every solver output to .npy.
+
+        Parameters
+        ----------
+        jobs: int, optional
+                Number of worker processes, 1 converts in this process
+        store: bool, optional
+                Write all timesteps into one memory-mapped (T, X, Y) store
+                instead of one .npy next to each text file
+        only_changed: bool, optional
+                Only convert text files that are new or changed since the
+                last conversion, according to the manifest
+        hash: bool, optional
+                Record a content hash, so touched but unchanged files are
+                not converted again
+        steps: slice or list, optional
+                Only convert these timesteps, see `select`
+        sparse: bool, optional
+                Save mostly empty frames cropped to their nonzero bounding
+                box or as a coordinate list in Cells_N_sparse.npz, loading
+                densifies them again
+
+        Returns
+        -------
+        converted: list
+                Text files that were converted
+        """
+        txt = self.get_solver_txt()
+        names = [_get_name(f) for f in txt]
+
+        todo = [os.path.join(self.directory, f) for f in self.select(steps)]
+        if only_changed:
+            todo = [f for f in todo if self._needs_conversion(f, store, hash)]
+
+        if store:
+            _, stored = self.get_store()
+            if stored != names:
+                # timesteps were added or removed, the store is rebuilt
+                self._store = None
+                mm = create_store(self.store_file, names, self.size_x, self.size_y)
+                # workers reopen the file themselves
+                del mm
+                todo = txt
+            index = {name: t for t, name in enumerate(names)}
+            store_file = self.store_file
         else:
-            mat = self._get_np_from_txt(full_file, self.size_x, self.size_y)
-            np.save(npy, mat)
-        return mat
+            index = {}
+            store_file = None
+        tasks = [
+            ConvertTask(
+                f,
+                self.size_x,
+                self.size_y,
+                store_file,
+                index.get(_get_name(f)),
+                hash,
+                sparse,
+            )
+            for f in todo
+        ]
+        jobs = max(1, min(jobs, len(tasks)))
 
-    def save_npy(self):
-        # TODO: prevent repeat loading files while getting vmin, vmax
-        mat = np.zeros((self.size_x, self.size_y), dtype=float)
+        with self.report.stage("convert") as stage:
+            if jobs == 1:
+                results = map(_convert_txt, tasks)
+                self._collect_npy(results, stage, len(tasks))
+            else:
+                chunksize = max(1, len(tasks) // (jobs * 4))
+                with multiprocessing.Pool(jobs) as pool:
+                    results = pool.imap_unordered(_convert_txt, tasks, chunksize)
+                    self._collect_npy(results, stage, len(tasks))
 
-        for f in self.get_solver_txt():
-            filename, _ = os.path.splitext(f)
-            npy = "{}.npy".format(filename)
+        self.finish_conversion()
 
-            try:
-                f_out = open(f, "r")
-            except IOError:
-                raise IOError(f'"{f}" does not exist or cannot be createed.')
-
-            for line in f_out.readlines():
-                line_list = line.rstrip("\n").split("\t")
-                x = int(line_list[0])
-                y = int(line_list[1])
-                c = float(line_list[5])
-                mat[x, y] = c
-
-                # uniform scale for later during plotting
-                if self.vmin > c:
-                    self.vmin = c
-                if self.vmax < c:
-                    self.vmax = c
-
-            f_out.close()
-
-            np.save(npy, mat)
-            print(f"\rtxt saved as {filename}.npy...", end="")
-
-        self.vmax += SHIFT
-        self.vmin += SHIFT
-        print()
-
-    def plot_solver(self, vmin=None, vmax=None):
-        SHIFT_TMP = 0.0  # no shifting when providing range
-        if not vmin and not vmax:
+        return todo
+
+    def conversion_tasks(
+        self, only_changed=False, hash=False, steps=None, sparse=False
+    ):
+        """ConvertTask to .npy of every timestep `save_npy` would convert.
+
+        For callers running the tasks themselves with `run_task`, results
+        go to `add_converted` and then `finish_conversion` once.
+        """
+        todo = [os.path.join(self.directory, f) for f in self.select(steps)]
+        if only_changed:
+            todo = [f for f in todo if self._needs_conversion(f, False, hash)]
+
+        return [
+            ConvertTask(f, self.size_x, self.size_y, None, None, hash, sparse)
+            for f in todo
+        ]
+
+    def finish_conversion(self):
+        """Save stats and manifest after conversion and update the colour scale.
+
+        Timesteps whose output disappeared are forgotten.
+        """
+        names = [_get_name(f) for f in self.index.files]
+        self.stats = {k: v for k, v in self.stats.items() if k in names}
+        converted = self.manifest[CONVERTED]
+        self.manifest[CONVERTED] = {k: v for k, v in converted.items() if k in names}
+
+        save_stats(self.stats_file, self.stats)
+        save_manifest(self.manifest_file, self.manifest)
+        self._update_scale()
+
+    def kymograph(
+        self,
+        reduce="mean",
+        axis=0,
+        band=None,
+        stride=1,
+        jobs=default_num_threads,
+        figname=None,
+        steps=None,
+    ):
+        """Reduce every timestep to a profile and stack them over time.
+
+        Each timestep is streamed from its .npy, the store or the text
+        output, so memory stays at about one grid row per worker.
+
+        Parameters
+        ----------
+        reduce: str, optional
+                One of "mean", "sum", "max" or "min"
+        axis: int, optional
+                0 reduces over x giving profiles along y, 1 over y
+        band: tuple, optional
+                (start, stop) range along `axis` to reduce over
+        stride: int, optional
+                Use every n-th timestep
+        jobs: int, optional
+                Number of worker processes
+        figname: str, optional
+                Also save the kymograph as an image
+        steps: slice or list, optional
+                Only these timesteps, see `select`
+
+        Returns
+        -------
+        kymo: np.ndarray
+                Array of shape (T, L), one row per timestep
+        """
+        files = self.select(steps)[::stride]
+        tasks = [self.profile_task(f, reduce, axis, band) for f in files]
+        jobs = max(1, min(jobs, len(tasks)))
+
+        with self.report.stage("profiles") as stage:
+            if jobs == 1:
+                kymo = self._collect_profiles(
+                    map(_reduce_solver_mat, tasks), files, stage
+                )
+            else:
+                with multiprocessing.Pool(jobs) as pool:
+                    results = pool.imap(_reduce_solver_mat, tasks)
+                    kymo = self._collect_profiles(results, files, stage)
+
+        if figname:
+            plot_kymograph(kymo, figname, [_get_name(f) for f in files])
+
+        return kymo
+
+    def profile_task(self, file, reduce="mean", axis=0, band=None):
+        """ProfileTask of one timestep, see `kymograph` for the parameters."""
+        full_file = os.path.join(self.directory, file)
+        return ProfileTask(
+            full_file, self.size_x, self.size_y, *self._locate(file), reduce, axis, band
+        )
+
+    def _collect_profiles(self, results, files, stage):
+        profiles = []
+        for f, profile in zip(files, results):
+            profiles.append(profile)
+            stage.progress(f, len(files), files=1)
+
+        return np.stack(profiles)
+
+    def save_fields(
+        self, dtype=np.float32, compress=False, jobs=default_num_threads, steps=None
+    ):
+        """Convert every column of the solver output to Cells_N_fields.npz.
+
+        All value columns are parsed in the same pass, so other quantities
+        than the Shh concentration need no extra text parse.
+
+        Parameters
+        ----------
+        dtype: np.dtype, optional
+                Type of the stored fields
+        compress: bool, optional
+                Use np.savez_compressed
+        jobs: int, optional
+                Number of worker processes
+        steps: slice or list, optional
+                Only these timesteps, see `select`
+        """
+        tasks = [
+            (os.path.join(self.directory, f), self.size_x, self.size_y, dtype, compress)
+            for f in self.select(steps)
+        ]
+        jobs = max(1, min(jobs, len(tasks)))
+
+        with self.report.stage("fields") as stage:
+            if jobs == 1:
+                self._collect_fields(map(_convert_fields, tasks), stage, len(tasks))
+            else:
+                chunksize = max(1, len(tasks) // (jobs * 4))
+                with multiprocessing.Pool(jobs) as pool:
+                    results = pool.imap_unordered(_convert_fields, tasks, chunksize)
+                    self._collect_fields(results, stage, len(tasks))
+
+    def _collect_fields(self, results, stage, total):
+        cells = self.size_x * self.size_y
+        for f in results:
+            size = os.path.getsize(f)
+            stage.progress(f, total, files=1, bytes=size, cells=cells)
+
+    def get_solver_fields(self, file, dtype=np.float32):
+        """All fields of one solver output, see `parse_solver_fields`.
+
+        A saved Cells_N_fields.npz is reused if it is fresh and of `dtype`,
+        otherwise the text file is converted again.
+        """
+        full_file = os.path.join(self.directory, file)
+        npz = os.path.splitext(full_file)[0] + FIELDS_SUFFIX
+        if _is_fresh(npz, full_file):
+            fields = load_fields(npz)
+            # all fields share one dtype, the first one is enough
+            if all(fields[k].dtype == dtype for k in fields.files[:1]):
+                return fields
+            fields.close()
+
+        _convert_fields((full_file, self.size_x, self.size_y, dtype, False))
+
+        return load_fields(npz)
+
+    def _needs_conversion(self, file, store, hash):
+        name = _get_name(file)
+        sig = self.manifest[CONVERTED].get(name)
+        if is_changed(file, sig, hash):
+            return True
+        if sig.get("store", False) != store:
+            return True
+        if not store:
+            filename = os.path.splitext(file)[0]
+            return not (
+                os.path.isfile(filename + ".npy")
+                or os.path.isfile(filename + SPARSE_SUFFIX)
+            )
+
+        return False
+
+    def _collect_npy(self, results, stage, total):
+        for f, stats, sig in results:
+            self.add_converted(f, stats, sig)
+            stage.progress(
+                f, total, files=1, bytes=sig["size"], cells=self.size_x * self.size_y
+            )
+
+    def add_converted(self, f, stats, sig):
+        """Record the result of a ConvertTask, see `conversion_tasks`."""
+        name = _get_name(f)
+        self.stats[name] = stats
+        self.manifest[CONVERTED][name] = sig
+
+    def _update_scale(self):
+        # uniform scale for later during plotting
+        self.histogram = merge_histograms(self.stats)
+        scale = global_range(self.stats)
+        if scale is None:
+            return
+
+        self.vmin = min(0.0, scale[0]) + SHIFT
+        self.vmax = max(0.0, scale[1]) + SHIFT
+
+    def color_limits(self, limits="positive"):
+        """Colour scale (vmin, vmax) from the histogram sketch of save_npy.
+
+        Only the merged sketch is used, no matrix is read again.
+
+        Parameters
+        ----------
+        limits: str or tuple, optional
+                "positive" spans the smallest positive value to the global
+                maximum, (lo, hi) are percentiles of the positive values,
+                e.g. (1, 99) ignores the most extreme cells on both ends
+
+        Returns
+        -------
+        vmin, vmax: float
+        """
+        if self.histogram is None or self.histogram.n_positive == 0:
+            raise FileNotFoundError(
+                f'No histogram sketch for "{self.directory}", run save_npy()'
+            )
+
+        if limits == "positive":
+            return self.histogram.min_positive(), global_range(self.stats)[1]
+
+        lo, hi = limits
+        return self.histogram.percentile(lo), self.histogram.percentile(hi)
+
+    def _plot_scale(self, vmin, vmax, limits):
+        # (shift, vmin, vmax) of the renderer, None while no explicit range
+        if vmin or vmax:
+            # no shifting when providing range
+            return 0.0, vmin, vmax
+        if limits is not None:
+            # zeros are shifted below vmin and take the lowest colour
+            return (SHIFT,) + self.color_limits(limits)
+
+        return SHIFT, None, None
+
+    def plot_solver(
+        self,
+        vmin=None,
+        vmax=None,
+        only_changed=False,
+        jobs=default_num_threads,
+        animation=None,
+        frame_rate=24,
+        stride=1,
+        downscale=1,
+        png=True,
+        preview=None,
+        preview_pool="mean",
+        steps=None,
+        limits=None,
+        raster=False,
+    ):
+        """Plot every timestep to solver/Cells_N.png.
+
+        Parameters
+        ----------
+        vmin, vmax: float, optional
+                Colour scale, the global range from save_npy if not given
+        limits: str or tuple, optional
+                Colour scale from the histogram sketch instead of the
+                global range, "positive" or percentiles, see `color_limits`
+        only_changed: bool, optional
+                Skip frames whose source and colour scale are unchanged
+                since they were last rendered
+        jobs: int, optional
+                Number of worker processes, each reusing one figure
+        animation: str, optional
+                Also encode the frames to this .gif or .mp4, in the same pass
+        frame_rate, stride, downscale: optional
+                Frames per second, every n-th timestep and shrink factor
+                of the animation
+        png: bool, optional
+                Save the PNGs, set to False to only make the animation
+        preview: int or bool, optional
+                Quick look: frames are block-reduced to at most `preview`
+                pixels per side (PREVIEW_SIZE if True) and saved at low DPI
+                to solver_preview/, the full-resolution frames and their
+                manifest records are left alone
+        preview_pool: str, optional
+                Block reduction of previews, "mean" or "max"
+        steps: slice or list, optional
+                Only plot these timesteps, see `select`
+        raster: bool, optional
+                Colour the frames in NumPy onto a template drawn once by
+                matplotlib, see `RasterRenderer`, much faster per frame
+
+        Returns
+        -------
+        rendered: list
+                PNGs that were (re)drawn
+        """
+        SHIFT_TMP, vmin, vmax = self._plot_scale(vmin, vmax, limits)
+        if vmin is None and vmax is None:
             vmin = self.vmin
             vmax = self.vmax
             warning(
@@ -245,25 +838,312 @@ class SolverProcessor:
                 UserWarning,
                 stacklevel=2,
             )
-            SHIFT_TMP = SHIFT
 
-        for f in self.solver_txt:
+        if preview is True:
+            preview = PREVIEW_SIZE
+        fig_dir = self.get_solver_directory()
+        if preview and png:
+            fig_dir = os.path.join(self.directory, PREVIEW_DIR)
+            os.makedirs(fig_dir, exist_ok=True)
+
+        scale = [None if v is None else float(v) for v in (vmin, vmax)]
+        rgb_stride = stride if animation is not None else None
+        tasks, records = self.frame_tasks(
+            scale, fig_dir, only_changed, png, preview, rgb_stride, steps, raster
+        )
+
+        writer = None
+        if animation is not None:
+            animation = os.path.join(self.directory, animation)
+            writer = AnimationWriter(animation, frame_rate, downscale=downscale)
+
+        jobs = max(1, min(jobs, len(tasks)))
+        init_args = (SHIFT_TMP, vmin, vmax, None, preview, preview_pool, raster)
+        with self.report.stage("plot" if png else "animate", "frames") as stage:
+            if jobs == 1:
+                _init_worker(*init_args)
+                try:
+                    results = map(_render_worker, tasks)
+                    self._collect_frames(results, records, writer, stage, len(tasks))
+                finally:
+                    _close_worker()
+            else:
+                with multiprocessing.Pool(jobs, _init_worker, init_args) as pool:
+                    if writer:
+                        # frames reach the animation in order, at most a few
+                        # per worker wait for the encoder
+                        depth = PREFETCH_DEPTH * jobs
+                        results = imap_bounded(pool, _render_worker, tasks, depth)
+                    else:
+                        results = pool.imap_unordered(_render_worker, tasks)
+                    self._collect_frames(results, records, writer, stage, len(tasks))
+
+            if writer:
+                writer.close()
+                self.report.info["animation"] = animation
+        save_manifest(self.manifest_file, self.manifest)
+
+        return [t.figname for t in tasks if t.figname]
+
+    def frame_tasks(
+        self,
+        scale,
+        fig_dir=None,
+        only_changed=False,
+        png=True,
+        preview=None,
+        rgb_stride=None,
+        steps=None,
+        raster=False,
+        shift=None,
+    ):
+        """FrameTask of every frame `plot_solver` would draw.
+
+        `scale` is the [vmin, vmax] recorded in the manifest, a `shift`
+        makes every task carry its (shift, vmin, vmax), so runs on
+        different scales can share the renderers of one pool. Frames drawn
+        with `run_task` are recorded by `add_rendered`.
+
+        Returns
+        -------
+        tasks: list
+                FrameTask per frame
+        records: dict
+                Manifest records by figname, for `add_rendered`
+        """
+        if fig_dir is None:
+            fig_dir = self.get_solver_directory()
+        task_scale = None if shift is None else (shift, *scale)
+        rendered = self.manifest[RENDERED]
+        tasks = []
+        records = {}
+        for i, f in enumerate(self.select(steps)):
             filename, _ = os.path.splitext(f)
-            npy = os.path.join(self.directory, "{}.npy".format(filename))
-            figname = os.path.join(
-                self.get_solver_directory(), "{}.png".format(filename)
+            figname = os.path.join(fig_dir, "{}.png".format(filename))
+
+            # a frame is redrawn if its source or the colour scale moved
+            full_file = os.path.join(self.directory, f)
+            record = rendered.get(filename, {})
+            if not png or (
+                only_changed
+                and not preview
+                and os.path.isfile(figname)
+                and record.get("scale") == scale
+                and record.get("raster", False) == raster
+                and not is_changed(full_file, record.get("source"))
+            ):
+                figname = None
+
+            rgb = rgb_stride is not None and i % rgb_stride == 0
+            if figname is None and not rgb:
+                continue
+
+            load_args = (full_file, self.size_x, self.size_y) + self._locate(f)
+            tasks.append(
+                FrameTask(_load_solver_mat, load_args, figname, rgb, task_scale)
+            )
+            if figname and not preview:
+                records[figname] = (
+                    filename,
+                    _render_record(file_signature(full_file), scale, raster),
+                )
+
+        return tasks, records
+
+    def add_rendered(self, figname, records):
+        """Record a frame drawn from `frame_tasks` in the manifest."""
+        if figname in records:
+            filename, record = records[figname]
+            self.manifest[RENDERED][filename] = record
+
+    def _collect_frames(self, results, records, writer, stage, total):
+        for figname, frame in results:
+            if frame is not None:
+                writer.append(frame)
+            self.add_rendered(figname, records)
+            stage.progress(figname, total, frames=1)
+
+    def animate(
+        self,
+        output_path="solver.gif",
+        frame_rate=24,
+        stride=1,
+        downscale=1,
+        jobs=default_num_threads,
+        preview=None,
+        preview_pool="mean",
+        steps=None,
+        limits=None,
+        raster=False,
+    ):
+        """Render the solver frames straight into an animation, no PNGs.
+
+        `preview` renders decimated low-DPI frames, `steps` picks the
+        timesteps, `limits` the colour scale and `raster` skips the figure
+        draw per frame, see `plot_solver`.
+        """
+        self.plot_solver(
+            jobs=jobs,
+            animation=output_path,
+            frame_rate=frame_rate,
+            stride=stride,
+            downscale=downscale,
+            png=False,
+            preview=preview,
+            preview_pool=preview_pool,
+            steps=steps,
+            limits=limits,
+            raster=raster,
+        )
+
+    def process(
+        self,
+        npy=True,
+        png=True,
+        vmin=None,
+        vmax=None,
+        jobs=default_num_threads,
+        depth=None,
+        hash=False,
+        preview=None,
+        preview_pool="mean",
+        steps=None,
+        limits=None,
+        raster=False,
+    ):
+        """Convert and plot every timestep in one pipelined pass.
+
+        A thread reads the text files ahead, worker processes parse them
+        and render the matrices straight from memory, so reading, parsing
+        and plotting overlap and no .npy has to be read back. At most
+        `depth` files are read but not yet done, which bounds memory.
+
+        Without `vmin` and `vmax` the global range of an earlier
+        `save_npy` is used, if some timesteps were never converted every
+        frame gets its own colour scale.
+
+        Parameters
+        ----------
+        npy: bool, optional
+                Also save Cells_N.npy, like `save_npy`
+        png: bool, optional
+                Plot to solver/Cells_N.png, like `plot_solver`
+        vmin, vmax: float, optional
+                Colour scale
+        limits: str or tuple, optional
+                Colour scale from the histogram sketch of an earlier
+                `save_npy`, see `color_limits`
+        jobs: int, optional
+                Number of worker processes, each parsing and rendering
+        depth: int, optional
+                Files in flight, PREFETCH_DEPTH per worker by default
+        hash: bool, optional
+                Record content hashes in the manifest
+        preview, preview_pool: optional
+                Fast low resolution frames, see `plot_solver`
+        steps: slice or list, optional
+                Only these timesteps, see `select`
+        raster: bool, optional
+                Fast NumPy frames, see `plot_solver`
+
+        Returns
+        -------
+        processed: list
+                Text files that went through the pipeline
+        """
+        names = [_get_name(f) for f in self.index.files]
+        txt = [os.path.join(self.directory, f) for f in self.select(steps)]
+
+        shift, vmin, vmax = self._plot_scale(vmin, vmax, limits)
+        if vmin is None and vmax is None:
+            if all(_get_name(f) in self.stats for f in txt):
+                vmin, vmax = self.vmin, self.vmax
+            elif png:
+                warning(
+                    "no global range from save_npy for every timestep,"
+                    " each frame is scaled on its own",
+                    UserWarning,
+                    stacklevel=2,
+                )
+
+        if preview is True:
+            preview = PREVIEW_SIZE
+        fig_dir = self.get_solver_directory()
+        if preview and png:
+            fig_dir = os.path.join(self.directory, PREVIEW_DIR)
+            os.makedirs(fig_dir, exist_ok=True)
+
+        jobs = max(1, min(jobs, len(txt)))
+        depth = depth or PREFETCH_DEPTH * jobs
+        read = functools.partial(_read_signed, hash=hash)
+        reads = prefetch(txt, depth, read)
+        tasks = (
+            (
+                f,
+                buf,
+                self.size_x,
+                self.size_y,
+                "{}.npy".format(os.path.splitext(f)[0]) if npy else None,
+                os.path.join(fig_dir, _get_name(f) + ".png") if png else None,
+                sig,
             )
+            for f, (sig, buf) in reads
+        )
+
+        scale = [None if v is None else float(v) for v in (vmin, vmax)]
+        init_args = (shift, vmin, vmax, None, preview, preview_pool, raster)
+        collect_args = (len(txt), npy, None if preview else scale, raster)
+        # the reader thread is stopped on errors as well
+        with contextlib.closing(reads), self.report.stage("pipeline") as stage:
+            if jobs == 1:
+                _init_worker(*init_args)
+                try:
+                    results = map(_pipeline_worker, tasks)
+                    self._collect_pipeline(results, stage, *collect_args)
+                finally:
+                    _close_worker()
+            else:
+                with multiprocessing.Pool(jobs, _init_worker, init_args) as pool:
+                    results = imap_bounded(pool, _pipeline_worker, tasks, depth)
+                    self._collect_pipeline(results, stage, *collect_args)
 
-            plot_solver_matrix(npy, SHIFT_TMP, vmin, vmax, figname)
-            print(f"\rPlotting {figname}...", end="")
+        self.stats = {k: v for k, v in self.stats.items() if k in names}
+        save_stats(self.stats_file, self.stats)
+        save_manifest(self.manifest_file, self.manifest)
+        self._update_scale()
 
-        print()
+        return txt
 
-    def png_to_gif(self, frame_rate=24, output_path="solver.gif"):
+    def _collect_pipeline(self, results, stage, total, npy, scale, raster):
+        cells = self.size_x * self.size_y
+        for f, n_bytes, stats, figname, sig in results:
+            name = _get_name(f)
+            self.stats[name] = stats
+            if figname and scale is not None:
+                self.manifest[RENDERED][name] = _render_record(sig, scale, raster)
+            if npy:
+                self.manifest[CONVERTED][name] = dict(sig, store=False)
+
+            frames = 1 if figname else 0
+            stage.progress(f, total, files=1, bytes=n_bytes, cells=cells, frames=frames)
+
+    def png_to_gif(self, frame_rate=24, output_path="solver.gif", steps=None):
         output_path = os.path.join(self.directory, output_path)
-        input_files = os.path.join(self.solver_directory, "Cells_*.png")
-        print(f"Making {output_path}...")
-        try:
+        # frames in step order, timesteps without a PNG are left out
+        input_files = [
+            os.path.join(self.solver_directory, _get_name(f) + ".png")
+            for f in self.select(steps)
+        ]
+        input_files = [f for f in input_files if os.path.isfile(f)]
+        with self.report.stage("gif", "frames") as stage:
             png_to_gif(input_files, frame_rate, output_path)
-        except AssertionError:
-            pass
+            stage.add(frames=len(input_files))
+        self.report.info["animation"] = output_path
+
+    def save_report(self, filename=None):
+        """Write the run report as JSON, to solver_report.json by default."""
+        if filename is None:
+            filename = os.path.join(self.directory, REPORT_FILENAME)
+        self.report.save(filename)
+
+        return filename
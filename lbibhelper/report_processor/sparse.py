@@ -0,0 +1,85 @@
+import numpy as np
+
+SPARSE_SUFFIX = "_sparse.npz"
+
+# a frame is only stored compacted if that takes at most this fraction
+# of the dense matrix
+SPARSE_THRESHOLD = 0.5
+
+
+def nonzero_bbox(mat):
+    """(x0, x1, y0, y1) of the nonzero cells of `mat`, empty for all zeros."""
+    rows = np.flatnonzero(mat.any(axis=1))
+    if rows.size == 0:
+        return 0, 0, 0, 0
+    cols = np.flatnonzero(mat.any(axis=0))
+
+    return rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+
+def compact(mat):
+    """Smaller of two compact forms of a 2D matrix, as a dict of arrays.
+
+    Either the nonzero bounding box ("bbox", "crop") or the flat indices
+    and values of the nonzero cells ("index", "values"), whichever takes
+    less memory. "shape" is always included, see `densify`.
+    """
+    x0, x1, y0, y1 = nonzero_bbox(mat)
+    crop = mat[x0:x1, y0:y1]
+    nnz = np.count_nonzero(crop)
+
+    index_dtype = np.int32 if mat.size < 2**31 else np.int64
+    shape = np.array(mat.shape)
+    if nnz * (mat.itemsize + np.dtype(index_dtype).itemsize) < crop.nbytes:
+        index = np.flatnonzero(mat).astype(index_dtype)
+        return {"shape": shape, "index": index, "values": mat.ravel()[index]}
+
+    bbox = np.array([x0, x1, y0, y1])
+    return {"shape": shape, "bbox": bbox, "crop": np.ascontiguousarray(crop)}
+
+
+def densify(arrays):
+    """Dense matrix back from the output of `compact`."""
+    if "index" in arrays:
+        values = arrays["values"]
+        mat = np.zeros(tuple(arrays["shape"]), dtype=values.dtype)
+        np.put(mat, arrays["index"], values)
+        return mat
+
+    crop = arrays["crop"]
+    x0, x1, y0, y1 = arrays["bbox"]
+    mat = np.zeros(tuple(arrays["shape"]), dtype=crop.dtype)
+    mat[x0:x1, y0:y1] = crop
+
+    return mat
+
+
+def save_sparse(filename, mat, threshold=SPARSE_THRESHOLD):
+    """Save `mat` compacted to `filename` (.npz) if that pays off.
+
+    Returns False and writes nothing when the compact form would take
+    more than `threshold` of the dense matrix.
+    """
+    arrays = compact(mat)
+    if sum(a.nbytes for a in arrays.values()) > threshold * mat.nbytes:
+        return False
+
+    np.savez(filename, **arrays)
+    return True
+
+
+def load_sparse(filename):
+    """Dense matrix from a file written by `save_sparse`."""
+    with np.load(filename) as f:
+        return densify(f)
+
+
+__all__ = [
+    "SPARSE_SUFFIX",
+    "SPARSE_THRESHOLD",
+    "nonzero_bbox",
+    "compact",
+    "densify",
+    "save_sparse",
+    "load_sparse",
+]
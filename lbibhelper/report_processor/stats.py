@@ -0,0 +1,58 @@
+import json
+import os
+import numpy as np
+from .sketch import LogHistogram
+
+STATS_FILENAME = "solver_stats.json"
+
+
+def frame_stats(mat):
+    """Summary statistics and histogram sketch of a single solver matrix."""
+    return {
+        "min": float(np.min(mat)),
+        "max": float(np.max(mat)),
+        "mean": float(np.mean(mat)),
+        "sum": float(np.sum(mat)),
+        "nonzero": int(np.count_nonzero(mat)),
+        # mergeable sketch for percentile colour limits, see sketch.py
+        "hist": LogHistogram.from_values(mat).to_dict(),
+    }
+
+
+def save_stats(filename, stats):
+    """Write per-timestep statistics, keyed by solver output name."""
+    tmp = "{}.tmp".format(filename)
+    with open(tmp, "w") as f:
+        json.dump(stats, f, indent=1, sort_keys=True)
+    os.replace(tmp, filename)
+
+
+def load_stats(filename):
+    """Read statistics written by `save_stats`, empty dict if there is none."""
+    if not os.path.isfile(filename):
+        return {}
+
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def global_range(stats):
+    """Global (min, max) over all timesteps in `stats`."""
+    if not stats:
+        return None
+
+    vmin = min(s["min"] for s in stats.values())
+    vmax = max(s["max"] for s in stats.values())
+
+    return vmin, vmax
+
+
+__all__ = [
+    "frame_stats",
+    "save_stats",
+    "load_stats",
+    "global_range",
+]
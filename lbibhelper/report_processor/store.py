@@ -0,0 +1,62 @@
+import json
+import os
+import numpy as np
+
+STORE_FILENAME = "solver_store.npy"
+STORE_INDEX_SUFFIX = ".json"
+
+
+def _index_filename(filename):
+    return os.path.splitext(filename)[0] + STORE_INDEX_SUFFIX
+
+
+def create_store(filename, names, size_x, size_y, dtype=float):
+    """Create a (T, size_x, size_y) memory-mapped store for a whole run.
+
+    Parameters
+    ----------
+    filename: str
+            Path of the .npy store
+    names: list
+            Timestep names, e.g. Cells_100, in storage order
+    size_x, size_y: int
+            LB grid size
+
+    Returns
+    -------
+    store: np.memmap
+            Writable store, zero initialised
+    """
+    store = np.lib.format.open_memmap(
+        filename, mode="w+", dtype=dtype, shape=(len(names), size_x, size_y)
+    )
+    with open(_index_filename(filename), "w") as f:
+        json.dump({"names": list(names)}, f, indent=1)
+
+    return store
+
+
+def open_store(filename, mode="r"):
+    """Open a store created by `create_store`.
+
+    Returns
+    -------
+    store: np.memmap
+            (T, size_x, size_y) array, only read from disk when sliced
+    names: list
+            Timestep names in storage order
+    """
+    index = _index_filename(filename)
+    if not os.path.isfile(filename) or not os.path.isfile(index):
+        raise FileNotFoundError(f'No solver store "{filename}"')
+
+    with open(index, "r") as f:
+        names = json.load(f)["names"]
+
+    return np.load(filename, mmap_mode=mode), names
+
+
+__all__ = [
+    "create_store",
+    "open_store",
+]
@@ -0,0 +1,239 @@
+import contextlib
+import csv
+import multiprocessing
+import os
+import numpy as np
+from lbibhelper.core.instrument import RunReport, print_progress
+from lbibhelper.core.settings import default_num_threads
+from lbibhelper.fit.batch import fit_exp_batch
+from .manifest import save_manifest
+from .render import _close_worker, _init_worker
+from .solver_processor import SHIFT, SolverProcessor, run_task
+from .stats import global_range
+from .timesteps import SOLVER_PATTERNS, natural_key, scan_timesteps
+
+TABLE_COLUMNS = [
+    "run",
+    "size_x",
+    "size_y",
+    "timesteps",
+    "first_step",
+    "last_step",
+    "min",
+    "max",
+    "c0",
+    "lambda",
+    "b",
+]
+
+
+def find_runs(root, patterns=SOLVER_PATTERNS):
+    """Directories below `root` (included) holding LBIBCell solver output.
+
+    Subdirectories of a run are not searched, runs are sorted naturally,
+    see `natural_key`.
+    """
+    runs = []
+    for directory, dirs, _ in os.walk(root):
+        if scan_timesteps(directory, patterns):
+            runs.append(directory)
+            dirs[:] = []
+
+    return sorted(runs, key=lambda d: (os.path.dirname(d), natural_key(d)))
+
+
+def _fit_profile(args):
+    # fit of one run for a shared pool, the fit itself runs in this worker
+    profile, p0, maxfev = args
+    x = np.arange(profile.size, dtype=float)
+    res = fit_exp_batch(x, profile[None], p0, jobs=1, maxfev=maxfev)
+
+    return {"c0": res.c0[0], "lambda": res.lam[0], "b": res.b[0]}
+
+
+class SweepProcessor:
+    """Process the runs of a parameter sweep on one shared worker pool.
+
+    Tasks of all runs are pooled together, largest first, so the workers
+    stay busy until the whole sweep is done instead of idling at the end
+    of every run.
+
+    Parameters
+    ----------
+    runs: str or list
+            Root directory searched with `find_runs`, or run directories
+    jobs: int, optional
+            Number of worker processes shared by all runs
+    report: RunReport, optional
+            Collects timings and counters, a new one by default
+    verbose: bool, optional
+            Print progress to stderr when no `report` is given
+    """
+
+    def __init__(self, runs, jobs=default_num_threads, report=None, verbose=True):
+        if isinstance(runs, str):
+            root = runs
+            runs = find_runs(root)
+            if not runs:
+                raise FileNotFoundError(f"No LBIBCell runs below {root}")
+
+        if report is None:
+            report = RunReport([print_progress] if verbose else None)
+        self.report = report
+        self.jobs = max(1, jobs)
+        self.runs = [SolverProcessor(d, verbose=False) for d in runs]
+        self.report.info["runs"] = len(self.runs)
+
+        # fitted c0, lambda and b per run directory
+        self.fits = {}
+        self._pool = None
+
+    @contextlib.contextmanager
+    def shared_pool(self):
+        """Keep one worker pool open for all stages run inside the block."""
+        if self._pool is not None or self.jobs == 1:
+            yield
+            return
+
+        init_args = (SHIFT, None, None, None)
+        with multiprocessing.Pool(self.jobs, _init_worker, init_args) as pool:
+            self._pool = pool
+            try:
+                yield
+            finally:
+                self._pool = None
+
+    def _imap(self, func, tasks, ordered=False):
+        # tasks through the shared pool, in this process without one
+        if self._pool is None:
+            return map(func, tasks)
+        if ordered:
+            return self._pool.imap(func, tasks)
+
+        chunksize = max(1, len(tasks) // (self.jobs * 4))
+        return self._pool.imap_unordered(func, tasks, chunksize)
+
+    def convert(self, only_changed=False, hash=False, steps=None, sparse=False):
+        """`SolverProcessor.save_npy` for every run, returns converted files."""
+        tasks = []
+        owner = {}
+        for run in self.runs:
+            for task in run.conversion_tasks(only_changed, hash, steps, sparse):
+                tasks.append(task)
+                owner[task.file] = run
+        # largest outputs first, small ones fill the gaps at the end
+        tasks.sort(key=lambda t: os.path.getsize(t.file), reverse=True)
+
+        with self.shared_pool(), self.report.stage("convert") as stage:
+            for f, stats, sig in self._imap(run_task, tasks):
+                run = owner[f]
+                run.add_converted(f, stats, sig)
+                cells = run.size_x * run.size_y
+                stage.progress(f, len(tasks), files=1, bytes=sig["size"], cells=cells)
+
+        for run in self.runs:
+            run.finish_conversion()
+
+        return [t.file for t in tasks]
+
+    def plot(self, only_changed=False, steps=None):
+        """`SolverProcessor.plot_solver` for every run, each on its own scale."""
+        tasks = []
+        owner = {}
+        for run in self.runs:
+            scale = [float(run.vmin), float(run.vmax)]
+            run_tasks, records = run.frame_tasks(
+                scale, only_changed=only_changed, steps=steps, shift=SHIFT
+            )
+            for task in run_tasks:
+                tasks.append((run.size_x * run.size_y, task))
+                owner[task.figname] = (run, records)
+        # largest grids first
+        tasks.sort(key=lambda t: t[0], reverse=True)
+        tasks = [task for _, task in tasks]
+
+        with self.shared_pool(), self.report.stage("plot", "frames") as stage:
+            if self._pool is None:
+                _init_worker(SHIFT, None, None, None)
+            try:
+                for figname, _ in self._imap(run_task, tasks):
+                    run, records = owner[figname]
+                    run.add_rendered(figname, records)
+                    stage.progress(figname, len(tasks), frames=1)
+            finally:
+                if self._pool is None:
+                    _close_worker()
+
+        for run in self.runs:
+            save_manifest(run.manifest_file, run.manifest)
+
+        return [t.figname for t in tasks]
+
+    def fit(self, p0=(1, 2, 1.0), maxfev=5000, steps=None):
+        """Fit `model_func` to the mean profile of the last timestep of every run.
+
+        Returns the fits, also kept in `fits`, keyed by run directory.
+        """
+        tasks = [run.profile_task(run.select(steps)[-1]) for run in self.runs]
+
+        with self.shared_pool(), self.report.stage("fit", "runs") as stage:
+            profiles = list(self._imap(run_task, tasks, ordered=True))
+            fit_tasks = [(p, p0, maxfev) for p in profiles]
+            results = self._imap(_fit_profile, fit_tasks, ordered=True)
+            for run, fit in zip(self.runs, results):
+                self.fits[run.directory] = fit
+                stage.progress(run.directory, len(self.runs), runs=1)
+
+        return self.fits
+
+    def run(self, only_changed=True, plot=True, fit=True, steps=None):
+        """Convert, plot and fit every run in one pool, returns `table`.
+
+        `steps` limits every run to a subset, see `SolverProcessor.select`.
+        """
+        with self.shared_pool():
+            self.convert(only_changed=only_changed, steps=steps)
+            if plot:
+                self.plot(only_changed=only_changed, steps=steps)
+            if fit:
+                self.fit(steps=steps)
+
+        return self.table()
+
+    def table(self):
+        """One row per run with the columns in TABLE_COLUMNS."""
+        rows = []
+        for run in self.runs:
+            vmin, vmax = global_range(run.stats) or (np.nan, np.nan)
+            fit = self.fits.get(run.directory, {})
+            rows.append(
+                {
+                    "run": run.directory,
+                    "size_x": run.size_x,
+                    "size_y": run.size_y,
+                    "timesteps": len(run.index),
+                    "first_step": run.index.steps[0],
+                    "last_step": run.index.steps[-1],
+                    "min": vmin,
+                    "max": vmax,
+                    "c0": fit.get("c0", np.nan),
+                    "lambda": fit.get("lambda", np.nan),
+                    "b": fit.get("b", np.nan),
+                }
+            )
+
+        return rows
+
+    def save_table(self, filename):
+        """Write `table` as CSV."""
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.table())
+
+
+__all__ = [
+    "TABLE_COLUMNS",
+    "find_runs",
+    "SweepProcessor",
+]
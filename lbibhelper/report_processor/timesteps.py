@@ -0,0 +1,114 @@
+import os
+import re
+
+# known names of LBIBCell solver outputs, the step is the only group
+SOLVER_PATTERNS = (
+    r"Cells_(\d+)\.txt",
+    r"Cells_solver_(\d+)\.txt",
+)
+
+_NUMBER_RE = re.compile(r"(\d+(?:\.\d+)?)")
+
+
+def scan_timesteps(directory, patterns=SOLVER_PATTERNS):
+    """Solver outputs in `directory` as a list of (step, filename).
+
+    Every pattern is tried in turn and the first one matching any file is
+    used, so a directory with both Cells_N.txt and Cells_solver_N.txt is
+    not mixed up. The list is sorted by step.
+    """
+    patterns = [re.compile(p) for p in patterns]
+    found = [[] for _ in patterns]
+    with os.scandir(directory) as it:
+        for entry in it:
+            for i, pattern in enumerate(patterns):
+                match = pattern.fullmatch(entry.name)
+                if match and entry.is_file():
+                    found[i].append((int(match.group(1)), entry.name))
+                    break
+
+    for steps in found:
+        if steps:
+            return sorted(steps)
+
+    return []
+
+
+def natural_key(name):
+    """Natural sort key of a file or directory name.
+
+    Every number in the name compares by value, decimals included, so
+    run_2 sorts before run_10 and D_0.125 before D_0.25 and D_0.5.
+    """
+    parts = _NUMBER_RE.split(os.path.basename(name))
+    # numbers are at the odd positions, so parts of two keys always match
+    parts[1::2] = [float(p) for p in parts[1::2]]
+
+    return parts
+
+
+class TimestepIndex:
+    """Solver outputs of one run, ordered by timestep.
+
+    Indexing goes by step, not by position::
+
+        index[5000]           # filename of step 5000
+        index[5000::10]       # every 10th output from step 5000 on
+        index[:2000]          # outputs before step 2000
+
+    A slice gives a new, smaller `TimestepIndex`.
+
+    Parameters
+    ----------
+    directory: str
+            LBIBCell output directory
+    patterns: tuple, optional
+            Regular expressions of the output names, see `scan_timesteps`
+    """
+
+    def __init__(self, directory, patterns=SOLVER_PATTERNS, entries=None):
+        self.directory = directory
+        if entries is None:
+            entries = scan_timesteps(directory, patterns)
+        self.steps = [step for step, _ in entries]
+        self.files = [name for _, name in entries]
+        self._by_step = dict(entries)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __contains__(self, step):
+        return step in self._by_step
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.select(key.start, key.stop, key.step or 1)
+
+        try:
+            return self._by_step[key]
+        except KeyError:
+            raise KeyError(f"No solver output for step {key} in {self.directory}")
+
+    def select(self, start=None, stop=None, stride=1):
+        """Outputs with start <= step < stop, every `stride`-th of them."""
+        entries = [
+            (step, name)
+            for step, name in zip(self.steps, self.files)
+            if (start is None or step >= start) and (stop is None or step < stop)
+        ]
+
+        return TimestepIndex(self.directory, entries=entries[::stride])
+
+    def paths(self):
+        return [os.path.join(self.directory, f) for f in self.files]
+
+
+__all__ = [
+    "SOLVER_PATTERNS",
+    "scan_timesteps",
+    "natural_key",
+    "TimestepIndex",
+]
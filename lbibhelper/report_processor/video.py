@@ -2,6 +2,9 @@ from lbibhelper.core.settings import warning
 
 # from myproject.models import some_model
 import os
+import shutil
+import subprocess
+import numpy as np
 
 # taken from https://github.com/taichi-dev/taichi/blob/master/python/taichi/tools/video.py
 # Write the frames to the disk and then make videos (mp4 or gif) if necessary
@@ -21,6 +24,11 @@ def png_to_gif(input_files, frame_rate=24, output_path="output.gif"):
             UserWarning,
             1,
         )
+        if shutil.which(get_convert_path()) is None:
+            raise FileNotFoundError(
+                f'"{get_convert_path()}" not found, install ImageMagick or '
+                "pass a list of files instead of a wildcard"
+            )
 
         delay = 100 / frame_rate
         command = (
@@ -30,15 +38,143 @@ def png_to_gif(input_files, frame_rate=24, output_path="output.gif"):
             + output_path
         )
         os.system(command)
+    elif isinstance(input_files, (list, tuple)):
+        from PIL import Image
+
+        with AnimationWriter(output_path, frame_rate) as writer:
+            for f in input_files:
+                with Image.open(f) as im:
+                    writer.append(np.asarray(im.convert("RGB")))
     else:
-        assert (
+        raise TypeError(
             'input_files should be list (of files) or str (of file template, like "%04d.png") instead of '
             + str(type(input_files))
         )
-    pass
+
+
+class AnimationWriter:
+    """Encode frames to a GIF or MP4 as they arrive.
+
+    Frames are written to the output straight away, so memory stays at
+    about one frame whatever the length of the animation. GIFs are
+    encoded with Pillow, MP4s are piped to ffmpeg as raw RGB.
+
+    Parameters
+    ----------
+    output_path: str
+            Output file, .gif or .mp4
+    frame_rate: float, optional
+            Frames per second
+    stride: int, optional
+            Keep only every `stride`-th appended frame
+    downscale: float, optional
+            Shrink every frame by this factor
+    """
+
+    def __init__(self, output_path, frame_rate=24, stride=1, downscale=1):
+        self.output_path = output_path
+        self.frame_rate = frame_rate
+        self.stride = max(1, int(stride))
+        self.downscale = downscale
+        self.format = os.path.splitext(output_path)[1].lower()
+        if self.format not in (".gif", ".mp4"):
+            raise ValueError(f'Unsupported animation format "{self.format}"')
+
+        self.size = None
+        self.n_appended = 0
+        self.n_written = 0
+        self._out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, frame):
+        """Add an (H, W, 3) or (H, W, 4) uint8 frame."""
+        self.n_appended += 1
+        if (self.n_appended - 1) % self.stride:
+            return
+
+        im = self._to_image(frame)
+        if self.format == ".gif":
+            self._write_gif(im)
+        else:
+            self._write_mp4(im)
+        self.n_written += 1
+
+    def _to_image(self, frame):
+        from PIL import Image
+
+        im = Image.fromarray(np.ascontiguousarray(frame[..., :3]), "RGB")
+        if self.size is None:
+            w, h = im.size
+            w, h = int(w / self.downscale), int(h / self.downscale)
+            if self.format == ".mp4":
+                # yuv420p needs even dimensions
+                w, h = w - w % 2, h - h % 2
+            self.size = (max(1, w), max(1, h))
+
+        if im.size != self.size:
+            im = im.resize(self.size, Image.BILINEAR)
+
+        return im
+
+    def _write_gif(self, im):
+        from PIL import GifImagePlugin
+
+        im = im.quantize(256)
+        duration = int(round(1000 / self.frame_rate))
+        if self._out is None:
+            self._out = open(self.output_path, "wb")
+            header, _ = GifImagePlugin.getheader(im, info={"loop": 0})
+            for block in header:
+                self._out.write(block)
+
+        # every frame carries its own palette
+        for block in GifImagePlugin.getdata(
+            im, duration=duration, include_color_table=True
+        ):
+            self._out.write(block)
+
+    def _write_mp4(self, im):
+        if self._out is None:
+            ffmpeg = shutil.which("ffmpeg")
+            if ffmpeg is None:
+                raise FileNotFoundError("ffmpeg not found, needed to write .mp4")
+
+            # fmt: off
+            command = [
+                ffmpeg, "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgb24",
+                "-s", "{:d}x{:d}".format(*self.size),
+                "-r", str(self.frame_rate),
+                "-i", "-",
+                "-pix_fmt", "yuv420p", "-vcodec", "libx264",
+                self.output_path,
+            ]
+            # fmt: on
+            self._out = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+        self._out.stdin.write(im.tobytes())
+
+    def close(self):
+        if self._out is None:
+            return
+
+        if self.format == ".gif":
+            self._out.write(b";")
+            self._out.close()
+        else:
+            self._out.stdin.close()
+            if self._out.wait() != 0:
+                raise RuntimeError(f'ffmpeg failed writing "{self.output_path}"')
+        self._out = None
 
 
 __all__ = [
     "png_to_gif",
+    "AnimationWriter",
     "get_convert_path",
 ]
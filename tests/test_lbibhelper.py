@@ -2,10 +2,62 @@
 
 """Tests for `lbibhelper` package."""
 
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
 import pytest
 
 
-from lbibhelper import lbibhelper
+from lbibhelper import cli, lbibhelper
+from lbibhelper.core.instrument import RunReport
+from lbibhelper.core.settings import read_first_last, readlast
+from lbibhelper.core.synthetic import (
+    synthetic_field,
+    write_solver_txt,
+    write_synthetic_run,
+)
+from lbibhelper.fit.batch import fit_exp_batch
+from lbibhelper.fit.physical import fit_shh, shh_model_inf_jac, shh_model_jac
+from lbibhelper.fit.solver import (
+    shh_read_out_analytic_sol_batch,
+    shh_read_out_analytic_sol_inf,
+    shh_readout_anl_sol_cf,
+    shh_readout_anl_sol_cp,
+    shh_readout_anl_sol_inf_cf,
+    shh_readout_anl_sol_inf_cp,
+)
+from lbibhelper.report_processor.parser import (
+    iter_blocks,
+    load_fields,
+    parse_solver_buffer,
+    parse_solver_chunked,
+    parse_solver_fields,
+    parse_solver_txt,
+    parse_solver_txt_lines,
+)
+from lbibhelper.report_processor.pipeline import imap_bounded, prefetch
+from lbibhelper.report_processor.raster import log_index, write_png
+from lbibhelper.report_processor.render import RasterRenderer, downsample
+from lbibhelper.report_processor.sketch import HIST_BINS_PER_DECADE, LogHistogram
+from lbibhelper.report_processor.sparse import compact, densify
+from lbibhelper.report_processor.sweep import (
+    TABLE_COLUMNS,
+    SweepProcessor,
+    find_runs,
+)
+from lbibhelper.report_processor.timesteps import TimestepIndex
+from lbibhelper.report_processor.reduce import REDUCTIONS, reduce_npy, reduce_txt
+from lbibhelper.report_processor.video import AnimationWriter
+from lbibhelper.report_processor.solver_processor import (
+    SHIFT,
+    SolverProcessor,
+    get_solver_mat,
+)
 
 
 @pytest.fixture
@@ -22,3 +74,684 @@ def test_content(response):
     """Sample pytest test function with the pytest fixture as an argument."""
     # from bs4 import BeautifulSoup
     # assert 'GitHub' in BeautifulSoup(response.content).title.string
+
+
+def _write_cells(path, mat):
+    with open(path, "w") as f:
+        for x in range(mat.shape[0]):
+            for y in range(mat.shape[1]):
+                f.write(f"{x}\t{y}\t0\t0.5\t1\t{float(mat[x, y])!r}\n")
+
+
+@pytest.fixture
+def solver_mat():
+    rng = np.random.default_rng(0)
+    mat = rng.random((7, 4))
+    mat[mat < 0.3] = 0.0
+    return mat
+
+
+def test_parse_solver_txt(tmp_path, solver_mat):
+    cells = tmp_path / "Cells_0.txt"
+    _write_cells(cells, solver_mat)
+
+    mat = parse_solver_txt(str(cells), *solver_mat.shape)
+    np.testing.assert_array_equal(mat, solver_mat)
+    np.testing.assert_array_equal(
+        mat, parse_solver_txt_lines(str(cells), *solver_mat.shape)
+    )
+
+
+def test_parse_solver_txt_fallback(tmp_path):
+    cells = tmp_path / "Cells_0.txt"
+    # trailing column on one row only, the bulk tokenizer gives up
+    cells.write_text("0\t0\t0\t0\t0\t1.5\n1\t0\t0\t0\t0\t2.5\textra\n")
+
+    mat = parse_solver_txt(str(cells), 2, 1)
+    np.testing.assert_array_equal(mat, [[1.5], [2.5]])
+    np.testing.assert_array_equal(parse_solver_buffer(cells.read_bytes(), 2, 1), mat)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_parse_solver_chunked(tmp_path, solver_mat, chunk_size):
+    cells = tmp_path / "Cells_0.txt"
+    _write_cells(cells, solver_mat)
+
+    # blocks hold whole lines only, lines straddling a block are carried over
+    blocks = list(iter_blocks(str(cells), chunk_size))
+    assert b"".join(blocks) == cells.read_bytes()
+    assert all(block.endswith(b"\n") for block in blocks)
+
+    out = np.lib.format.open_memmap(
+        tmp_path / "out.npy", mode="w+", shape=solver_mat.shape
+    )
+    out[:] = -1.0
+    mat = parse_solver_chunked(str(cells), *solver_mat.shape, out=out, chunk_size=64)
+    assert mat is out
+    np.testing.assert_array_equal(np.load(tmp_path / "out.npy"), solver_mat)
+
+    mat = parse_solver_txt(str(cells), *solver_mat.shape, chunk_size=chunk_size)
+    np.testing.assert_array_equal(mat, solver_mat)
+    fields = parse_solver_fields(str(cells), *solver_mat.shape, chunk_size=chunk_size)
+    np.testing.assert_array_equal(fields["c5"], solver_mat.astype(np.float32))
+
+
+def test_parse_solver_chunked_fallback(tmp_path):
+    cells = tmp_path / "Cells_0.txt"
+    # the second block is ragged, no trailing newline at the end
+    cells.write_text("0\t0\t0\t0\t0\t1.5\n1\t0\t0\t0\t0\t2.5\textra\n1\t1\t0\t0\t0\t3")
+
+    mat = parse_solver_chunked(str(cells), 2, 2, chunk_size=16)
+    np.testing.assert_array_equal(mat, [[1.5, 0.0], [2.5, 3.0]])
+
+
+@pytest.fixture
+def solver_dir(tmp_path, solver_mat):
+    for step in range(3):
+        _write_cells(tmp_path / f"Cells_{step * 100}.txt", solver_mat * step)
+    (tmp_path / "log.txt").write_text("LBIBCell log\n")
+    return tmp_path
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_save_npy(solver_dir, solver_mat, jobs):
+    proc = SolverProcessor(str(solver_dir))
+    proc.save_npy(jobs=jobs)
+
+    for step in range(3):
+        mat = np.load(solver_dir / f"Cells_{step * 100}.npy")
+        np.testing.assert_array_equal(mat, solver_mat * step)
+    assert proc.vmax == pytest.approx(solver_mat.max() * 2 + SHIFT)
+
+
+def test_stats_sidecar(solver_dir, solver_mat):
+    SolverProcessor(str(solver_dir)).save_npy(jobs=1)
+
+    proc = SolverProcessor(str(solver_dir))
+    assert sorted(proc.stats) == ["Cells_0", "Cells_100", "Cells_200"]
+    assert proc.stats["Cells_200"]["sum"] == pytest.approx(solver_mat.sum() * 2)
+    assert proc.stats["Cells_100"]["nonzero"] == np.count_nonzero(solver_mat)
+    assert proc.vmin == pytest.approx(SHIFT)
+    assert proc.vmax == pytest.approx(solver_mat.max() * 2 + SHIFT)
+
+
+def test_solver_store(solver_dir, solver_mat):
+    proc = SolverProcessor(str(solver_dir))
+    proc.save_npy(jobs=2, store=True)
+
+    assert not (solver_dir / "Cells_100.npy").exists()
+    assert proc[:].shape == (3,) + solver_mat.shape
+    np.testing.assert_array_equal(proc[2], solver_mat * 2)
+    np.testing.assert_array_equal(proc[0:2, 3, :], [solver_mat[3] * 0, solver_mat[3]])
+    np.testing.assert_array_equal(
+        proc.time_series(1, 2), solver_mat[1, 2] * np.arange(3)
+    )
+    np.testing.assert_array_equal(proc.get_solver_mat("Cells_100.txt"), solver_mat)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_plot_solver(solver_dir, jobs):
+    proc = SolverProcessor(str(solver_dir))
+    proc.save_npy(jobs=1)
+    proc.plot_solver(jobs=jobs)
+
+    for step in range(3):
+        assert (solver_dir / "solver" / f"Cells_{step * 100}.png").is_file()
+    proc.png_to_gif(output_path="solver.gif")
+    assert (solver_dir / "solver.gif").is_file()
+
+    png = solver_dir / "solver" / "Cells_100.png"
+    mtime = os.stat(png).st_mtime_ns
+    SolverProcessor(str(solver_dir)).plot_solver(only_changed=True, jobs=jobs)
+    assert os.stat(png).st_mtime_ns == mtime
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_process(solver_dir, solver_mat, jobs):
+    proc = SolverProcessor(str(solver_dir), verbose=False)
+    proc.process(jobs=jobs, depth=1)
+
+    for step in range(3):
+        assert (solver_dir / "solver" / f"Cells_{step * 100}.png").is_file()
+    np.testing.assert_array_equal(np.load(solver_dir / "Cells_200.npy"), solver_mat * 2)
+    assert proc.vmax == pytest.approx(solver_mat.max() * 2 + SHIFT)
+    assert proc.report.stages["pipeline"].counters["frames"] == 3
+
+    # converted by the pipeline, nothing left to do
+    assert proc.save_npy(jobs=1, only_changed=True) == []
+
+    # the second pass knows the global range, like plot_solver
+    proc.process(jobs=jobs, npy=False)
+    assert proc.plot_solver(jobs=1, only_changed=True) == []
+
+
+def test_process_malformed(tmp_path):
+    files = write_synthetic_run(tmp_path, 20, 5, n_steps=30)
+    with open(files[1], "a") as f:
+        f.write("garbage\tline\n")
+
+    # a failing worker surfaces the error instead of stalling the pool
+    proc = SolverProcessor(str(tmp_path), verbose=False)
+    threads = threading.active_count()
+    for jobs in [1, 2]:
+        with pytest.raises(ValueError):
+            proc.process(jobs=jobs, png=False, depth=2)
+    # no prefetch reader is left behind
+    assert threading.active_count() == threads
+
+
+def test_imap_bounded():
+    pulled = []
+
+    def tasks():
+        for i in range(-10, 0):
+            pulled.append(i)
+            yield i
+
+    with multiprocessing.Pool(2) as pool:
+        for i, res in enumerate(imap_bounded(pool, abs, tasks(), 3)):
+            assert res == 10 - i
+            # at most three tasks in flight plus the one just pulled
+            assert len(pulled) <= i + 4
+
+
+def test_prefetch(tmp_path):
+    files = [tmp_path / f"{i}.txt" for i in range(5)]
+    for i, f in enumerate(files):
+        f.write_bytes(b"x" * i)
+
+    items = list(prefetch(files, depth=1))
+    assert [f for f, _ in items] == files
+    assert [len(buf) for _, buf in items] == list(range(5))
+
+    with pytest.raises(IOError):
+        list(prefetch([tmp_path / "missing.txt"]))
+
+    # closing early stops the reader blocked on the full queue
+    threads = threading.active_count()
+    reads = prefetch(files, depth=1)
+    next(reads)
+    reads.close()
+    assert threading.active_count() == threads
+
+
+@pytest.mark.parametrize("pool", ["mean", "max"])
+def test_downsample(pool):
+    mat = np.arange(35, dtype=float).reshape(7, 5)
+    small = downsample(mat, 3, pool)
+
+    # 3x3 blocks, the last row and column of blocks are cut short
+    assert small.shape == (3, 2)
+    func = getattr(np, pool)
+    assert small[0, 0] == func(mat[:3, :3])
+    assert small[2, 1] == func(mat[6:, 3:])
+    assert downsample(mat, 7, pool) is mat
+
+
+def test_plot_solver_preview(solver_dir):
+    proc = SolverProcessor(str(solver_dir))
+    proc.save_npy(jobs=1)
+    rendered = proc.plot_solver(jobs=1, preview=2)
+
+    assert len(rendered) == 3
+    assert (solver_dir / "solver_preview" / "Cells_100.png").is_file()
+    assert not (solver_dir / "solver" / "Cells_100.png").exists()
+    assert proc.manifest["rendered"] == {}
+
+
+def test_log_index():
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    mat = np.array([[0.0, 1e-9, 1e-6], [1e-3, 0.5, 1.0], [2.0, -1.0, np.nan]])
+    cmap = plt.get_cmap("coolwarm")
+    expected = cmap(LogNorm(1e-6, 1.0)(mat), bytes=True)
+    lut = np.vstack([cmap(np.arange(cmap.N), bytes=True), [0, 0, 0, 0]])
+
+    np.testing.assert_array_equal(lut[log_index(mat, 1e-6, 1.0, cmap.N)], expected)
+
+
+def test_raster_renderer(tmp_path, solver_mat):
+    import matplotlib.pyplot as plt
+
+    rgb = np.random.default_rng(0).integers(0, 256, (5, 7, 3), dtype=np.uint8)
+    write_png(tmp_path / "rgb.png", rgb)
+    np.testing.assert_array_equal(plt.imread(tmp_path / "rgb.png")[..., :3] * 255, rgb)
+
+    renderer = RasterRenderer(SHIFT, SHIFT, solver_mat.max() + SHIFT)
+    frame = renderer.to_rgb(solver_mat)
+    assert frame.dtype == np.uint8 and frame.ndim == 3
+    # the template is reused, only the image area changes
+    other = renderer.to_rgb(solver_mat[::-1])
+    assert frame.shape == other.shape and not np.array_equal(frame, other)
+    assert len(renderer.templates) == 1
+
+    renderer.render(solver_mat, tmp_path / "frame.png")
+    assert plt.imread(tmp_path / "frame.png").shape[2] == 3
+
+
+@pytest.mark.parametrize(
+    "mat",
+    [
+        np.zeros((6, 5)),
+        np.pad(np.ones((2, 3)), ((1, 3), (2, 0))),
+        np.eye(40)[:, :30] * 3.5,
+    ],
+)
+def test_compact(mat):
+    arrays = compact(mat)
+    # small blocks are cropped, scattered cells listed
+    assert ("index" in arrays) == (np.count_nonzero(mat) == 30)
+    np.testing.assert_array_equal(densify(arrays), mat)
+
+
+def test_save_npy_sparse(solver_dir, solver_mat):
+    proc = SolverProcessor(str(solver_dir), verbose=False)
+    proc.save_npy(jobs=1, sparse=True)
+
+    # Cells_0 is all zeros, the others are mostly nonzero and stay dense
+    assert (solver_dir / "Cells_0_sparse.npz").is_file()
+    assert not (solver_dir / "Cells_0.npy").exists()
+    assert (solver_dir / "Cells_100.npy").is_file()
+    assert proc.save_npy(jobs=1, only_changed=True) == []
+
+    np.testing.assert_array_equal(
+        get_solver_mat(str(solver_dir / "Cells_0.txt")), np.zeros_like(solver_mat)
+    )
+    np.testing.assert_array_equal(
+        get_solver_mat(str(solver_dir / "Cells_0.txt"), flatten=True),
+        np.zeros(solver_mat.shape[1]),
+    )
+    assert proc.get_solver_mat("Cells_0.txt").shape == solver_mat.shape
+
+
+def test_log_histogram():
+    rng = np.random.default_rng(1)
+    a = 10 ** rng.uniform(-8, 2, 5000)
+    b = np.concatenate([10 ** rng.uniform(-3, 0, 3000), np.zeros(100), [-1.0]])
+
+    hist = LogHistogram.from_values(a) + LogHistogram.from_dict(
+        LogHistogram.from_values(b).to_dict()
+    )
+    expected = LogHistogram.from_values(np.concatenate([a, b]))
+    np.testing.assert_array_equal(hist.counts, expected.counts)
+    assert (hist.zero, hist.negative, hist.n_positive) == (100, 1, 8000)
+
+    positive = np.concatenate([a, b[b > 0]])
+    bin_factor = 10 ** (1 / HIST_BINS_PER_DECADE)
+    for p in [0, 1, 50, 99, 100]:
+        assert hist.percentile(p) == pytest.approx(
+            np.percentile(positive, p), rel=bin_factor - 1
+        )
+    assert positive.min() / bin_factor <= hist.min_positive() <= positive.min()
+    assert LogHistogram().quantile(0.5) is None
+
+
+def test_color_limits(solver_dir, solver_mat):
+    proc = SolverProcessor(str(solver_dir), verbose=False)
+    with pytest.raises(FileNotFoundError):
+        proc.color_limits()
+    proc.save_npy(jobs=2)
+
+    # the sketch is kept in the sidecar, nothing is read again
+    proc = SolverProcessor(str(solver_dir), verbose=False)
+    positive = np.concatenate([solver_mat[solver_mat > 0] * s for s in (1, 2)])
+    vmin, vmax = proc.color_limits()
+    assert vmin <= positive.min() and vmax == pytest.approx(positive.max())
+    lo, hi = proc.color_limits((10, 90))
+    assert vmin < lo < hi < vmax
+
+    assert len(proc.plot_solver(jobs=1, limits=(1, 99))) == 3
+
+    # raster frames replace the matplotlib ones and the other way round
+    assert len(proc.plot_solver(jobs=2, limits=(1, 99), raster=True)) == 3
+    assert (
+        proc.plot_solver(jobs=1, limits=(1, 99), raster=True, only_changed=True) == []
+    )
+    assert len(proc.plot_solver(jobs=1, limits=(1, 99), only_changed=True)) == 3
+
+
+@pytest.mark.parametrize("store", [False, True])
+def test_save_npy_only_changed(solver_dir, solver_mat, store):
+    proc = SolverProcessor(str(solver_dir))
+    assert len(proc.save_npy(jobs=1, store=store, only_changed=True)) == 3
+    assert proc.save_npy(jobs=1, store=store, only_changed=True) == []
+
+    cells = solver_dir / "Cells_100.txt"
+    _write_cells(cells, solver_mat * 5)
+    os.utime(cells, ns=(0, os.stat(cells).st_mtime_ns + 10**9))
+    converted = proc.save_npy(jobs=1, store=store, only_changed=True)
+    assert converted == [str(cells)]
+    np.testing.assert_array_equal(proc.get_solver_mat("Cells_100.txt"), solver_mat * 5)
+    assert proc.vmax == pytest.approx(solver_mat.max() * 5 + SHIFT)
+
+
+def test_get_solver_mat_stale_npy(solver_dir, solver_mat):
+    cells = solver_dir / "Cells_100.txt"
+    np.save(solver_dir / "Cells_100.npy", solver_mat * 7)
+    os.utime(cells, ns=(0, os.stat(cells).st_mtime_ns + 10**9))
+
+    np.testing.assert_array_equal(get_solver_mat(str(cells)), solver_mat)
+
+
+def test_touched_hash(solver_dir, solver_mat, monkeypatch):
+    proc = SolverProcessor(str(solver_dir), verbose=False)
+    proc.save_npy(jobs=1, hash=True)
+
+    cells = solver_dir / "Cells_100.txt"
+    os.utime(cells, ns=(0, os.stat(cells).st_mtime_ns + 10**9))
+    assert proc.save_npy(jobs=1, only_changed=True, hash=True) == []
+    # the new mtime is recorded, no hashing next time
+    sig = proc.manifest["converted"]["Cells_100"]
+    assert sig["mtime_ns"] == os.stat(cells).st_mtime_ns
+    assert SolverProcessor(str(solver_dir)).save_npy(jobs=1, only_changed=True) == []
+
+    # the manifest, not the mtime, says the .npy is still fresh
+    for name in ["_get_np_from_txt", "reduce_txt"]:
+        monkeypatch.setattr(
+            f"lbibhelper.report_processor.solver_processor.{name}", None
+        )
+    np.testing.assert_array_equal(proc.get_solver_mat("Cells_100.txt"), solver_mat)
+    np.testing.assert_array_equal(get_solver_mat(str(cells)), solver_mat)
+    assert proc.kymograph(jobs=1).shape == (3, solver_mat.shape[1])
+
+
+def test_get_solver_mat_manifest_cached(solver_dir, solver_mat, monkeypatch):
+    from lbibhelper.report_processor import solver_processor
+
+    proc = SolverProcessor(str(solver_dir), verbose=False)
+    proc.save_npy(jobs=1)
+    loads = []
+    original = solver_processor.load_manifest
+
+    def load_manifest(filename):
+        loads.append(filename)
+        return original(filename)
+
+    monkeypatch.setattr(solver_processor, "load_manifest", load_manifest)
+    for _ in range(3):
+        for f in proc.solver_txt:
+            get_solver_mat(str(solver_dir / f))
+    assert len(loads) == 1
+
+    # a rewritten manifest is read again
+    os.utime(proc.manifest_file, ns=(0, os.stat(proc.manifest_file).st_mtime_ns + 1))
+    get_solver_mat(str(solver_dir / "Cells_100.txt"), flatten=True)
+    assert len(loads) == 2
+
+
+@pytest.mark.parametrize("block_size", [3, 4096])
+def test_read_first_last(tmp_path, block_size):
+    log = tmp_path / "log.txt"
+    log.write_text("x\ty\tc\n0\t0\t1.0\n12\t34\t2.0\n\n")
+
+    first, last, offset = read_first_last(str(log), block_size)
+    assert first == "x\ty\tc"
+    assert last == "12\t34\t2.0"
+    assert offset == len("x\ty\tc\n")
+    assert readlast(str(log)) == last
+
+    log.write_text("0\t0\t1.0")
+    assert read_first_last(str(log), block_size) == ("0\t0\t1.0", "0\t0\t1.0", 0)
+
+
+def test_animate(solver_dir):
+    from PIL import Image
+
+    proc = SolverProcessor(str(solver_dir))
+    proc.save_npy(jobs=1)
+    proc.animate("solver.gif", stride=2, downscale=2, jobs=2)
+
+    assert not (solver_dir / "solver" / "Cells_0.png").exists()
+    with Image.open(solver_dir / "solver.gif") as im:
+        assert im.n_frames == 2
+
+
+def test_animation_writer(tmp_path):
+    from PIL import Image
+
+    frames = [np.full((8, 10, 3), i * 50, dtype=np.uint8) for i in range(4)]
+    with AnimationWriter(str(tmp_path / "out.gif"), frame_rate=10) as writer:
+        for frame in frames:
+            writer.append(frame)
+
+    with Image.open(tmp_path / "out.gif") as im:
+        assert im.n_frames == 4
+        assert im.size == (10, 8)
+        im.seek(3)
+        np.testing.assert_array_equal(np.asarray(im.convert("RGB")), frames[3])
+
+
+@pytest.mark.parametrize("inf", [False, True])
+def test_shh_analytic_sol_batch(inf):
+    x = np.linspace(0, 100, 51)
+    k = np.array([0.01, 0.05, 0.2])
+    res = shh_read_out_analytic_sol_batch(x, 2.0, 0.5, 30.0, 100.0, k, inf=inf)
+    assert res.shape == (3, 51)
+
+    cf, cp = (
+        (shh_readout_anl_sol_inf_cf, shh_readout_anl_sol_inf_cp)
+        if inf
+        else (shh_readout_anl_sol_cf, shh_readout_anl_sol_cp)
+    )
+    for i in range(3):
+        expected = np.where(
+            x <= 30.0,
+            cf(x, 2.0, 0.5, 30.0, 100.0, k[i]),
+            cp(x, 2.0, 0.5, 30.0, 100.0, k[i]),
+        )
+        np.testing.assert_allclose(res[i], expected)
+
+    scalar = shh_read_out_analytic_sol_inf(40.0, 2.0, 0.5, 30.0, 100.0, 0.05)
+    assert scalar == pytest.approx(
+        shh_readout_anl_sol_inf_cp(40.0, 2.0, 0.5, 30.0, 100.0, 0.05)
+    )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_fit_exp_batch(jobs):
+    x = np.linspace(0, 10, 60)
+    k = np.linspace(0.5, 1.5, 6)
+    profiles = 3.0 * np.exp(-k[:, None] * x) + 0.2
+
+    res = fit_exp_batch(x, profiles, jobs=jobs)
+    np.testing.assert_allclose(res.k, k, rtol=1e-6)
+    np.testing.assert_allclose(res.lam, 1 / k, rtol=1e-6)
+    np.testing.assert_allclose(res.c0, 3.0, rtol=1e-6)
+    np.testing.assert_allclose(res.b, 0.2, rtol=1e-6)
+    assert res.pcov.shape == (6, 3, 3)
+
+
+@pytest.mark.parametrize("Lt", [None, 120.0])
+def test_fit_shh(Lt):
+    x = np.linspace(0, 120, 200)
+    Lf, a, k = 30.0, 4.0, 0.08
+    inf = Lt is None
+    y = shh_read_out_analytic_sol_batch(x, a, 1.0, Lf, Lt or 0.0, k, inf=inf)[0]
+
+    jac = shh_model_inf_jac(x, a, k, Lf) if inf else shh_model_jac(x, a, k, Lf, Lt)
+    for i, h in enumerate([(1e-6, 0), (0, 1e-8)]):
+        up = shh_read_out_analytic_sol_batch(
+            x, a + h[0], 1.0, Lf, Lt or 0.0, k + h[1], inf=inf
+        )[0]
+        np.testing.assert_allclose(jac[:, i], (up - y) / sum(h), rtol=1e-4, atol=1e-6)
+
+    res = fit_shh(x, y, Lf, Lt)
+    assert res.p_d == pytest.approx(a, rel=1e-6)
+    assert res.k == pytest.approx(k, rel=1e-6)
+    assert res.pcov.shape == (2, 2)
+
+
+def test_cli(solver_dir, capsys):
+    assert cli.main(["convert", str(solver_dir), "--jobs", "1"]) == 0
+    assert (solver_dir / "Cells_200.npy").is_file()
+    out = capsys.readouterr().out
+    assert "convert" in out and "items/s" in out
+
+    report = solver_dir / "report.json"
+    argv = ["convert", str(solver_dir), "-j", "1", "--only-changed", "-q"]
+    assert cli.main(argv + ["--report", str(report)]) == 0
+    assert json.loads(report.read_text())["info"]["command"] == "convert"
+    assert cli.main(["stats", str(solver_dir)]) == 0
+    assert "Cells_100" in capsys.readouterr().out
+
+    fits = solver_dir / "fit.csv"
+    assert cli.main(["fit", str(solver_dir), "-j", "1", "-o", str(fits)]) == 0
+    assert fits.read_text().startswith("timestep,c0,lambda,b")
+
+
+def test_timestep_index(tmp_path, solver_mat):
+    for step in [0, 5, 10, 100, 1000]:
+        _write_cells(tmp_path / f"Cells_solver_{step}.txt", solver_mat)
+    (tmp_path / "log.txt").write_text("LBIBCell log\n")
+    (tmp_path / "notes.txt").write_text("not an output\n")
+
+    index = TimestepIndex(str(tmp_path))
+    assert index.steps == [0, 5, 10, 100, 1000]
+    assert index[100] == "Cells_solver_100.txt"
+    assert index[5::2].steps == [5, 100]
+    assert index[:100].steps == [0, 5, 10]
+    with pytest.raises(KeyError):
+        index[7]
+
+    proc = SolverProcessor(str(tmp_path), verbose=False)
+    assert proc.solver_txt == index.files
+    assert proc.save_npy(jobs=1, steps=slice(10, None)) == index[10:].paths()
+    assert proc.save_npy(jobs=1, only_changed=True, steps=[5]) == [index.paths()[1]]
+    assert len(proc.kymograph(jobs=1, steps=[0, 1000])) == 2
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_sweep(tmp_path, jobs):
+    for i, lam in enumerate([4.0, 8.0]):
+        run = tmp_path / "sweep" / f"run_{i}"
+        write_synthetic_run(str(run), 6, 40, n_steps=2, step=10)
+        # fit the last timestep against a known decay length
+        write_solver_txt(str(run / "Cells_10.txt"), synthetic_field(6, 40, lam=lam))
+
+    sweep = SweepProcessor(str(tmp_path), jobs=jobs, verbose=False)
+    assert [os.path.basename(r.directory) for r in sweep.runs] == ["run_0", "run_1"]
+
+    table = sweep.run(plot=False)
+    assert [row["timesteps"] for row in table] == [2, 2]
+    assert table[1]["max"] == pytest.approx(1.0)
+    assert [row["lambda"] for row in table] == pytest.approx([4.0, 8.0], rel=1e-4)
+    assert sweep.convert(only_changed=True) == []
+
+    figs = sweep.plot()
+    assert len(figs) == 4 and all(os.path.isfile(f) for f in figs)
+    assert sweep.plot(only_changed=True) == []
+
+    sweep.save_table(str(tmp_path / "sweep.csv"))
+    assert (tmp_path / "sweep.csv").read_text().startswith(",".join(TABLE_COLUMNS))
+
+
+def test_find_runs_natural_order(tmp_path):
+    names = ["D_0.5", "D_0.125", "D_0.25", "run_10", "run_2"]
+    for name in names:
+        write_synthetic_run(str(tmp_path / name), 4, 4, n_steps=1)
+
+    runs = [os.path.basename(d) for d in find_runs(str(tmp_path))]
+    assert runs == ["D_0.125", "D_0.25", "D_0.5", "run_2", "run_10"]
+
+
+def test_run_report(solver_dir, solver_mat):
+    events = []
+    report = RunReport([events.append])
+    proc = SolverProcessor(str(solver_dir), report=report)
+    proc.save_npy(jobs=2)
+    proc.kymograph(jobs=1)
+
+    stage = report.stages["convert"]
+    assert stage.count == 3
+    assert stage.counters["cells"] == 3 * solver_mat.size
+    assert stage.counters["bytes"] == sum(
+        os.path.getsize(f) for f in proc.get_solver_txt()
+    )
+    assert report.stages["profiles"].count == 3
+    assert [e["done"] for e in events if e["stage"] == "convert"] == [1, 2, 3, 3]
+    assert events[-1]["finished"]
+
+    data = json.loads(open(proc.save_report()).read())
+    assert data["info"]["grid"] == list(solver_mat.shape)
+    assert data["stages"]["convert"]["counters"]["files"] == 3
+
+
+def test_write_synthetic_run(tmp_path):
+    files = write_synthetic_run(str(tmp_path), 12, 5, n_steps=3, sparsity=0.4)
+    assert [os.path.basename(f) for f in files] == [
+        "Cells_0.txt",
+        "Cells_100.txt",
+        "Cells_200.txt",
+    ]
+    assert (tmp_path / "log.txt").is_file()
+
+    mat = parse_solver_txt(files[2], 12, 5)
+    expected = synthetic_field(12, 5, 3, sparsity=0.4, seed=2)
+    np.testing.assert_allclose(mat, expected, rtol=1e-8)
+    assert np.count_nonzero(mat == 0) > 0
+    assert SolverProcessor(str(tmp_path)).get_size() == (12, 5)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_save_fields(solver_dir, solver_mat, compress):
+    proc = SolverProcessor(str(solver_dir))
+    proc.save_fields(compress=compress, jobs=1)
+
+    fields = load_fields(str(solver_dir / "Cells_100_fields.npz"))
+    assert sorted(fields.files) == ["c2", "c3", "c4", "c5"]
+    assert fields["c5"].dtype == np.float32
+    np.testing.assert_allclose(fields["c5"], solver_mat, rtol=1e-6)
+    np.testing.assert_array_equal(fields["c3"], 0.5)
+
+    fields = proc.get_solver_fields("Cells_200.txt")
+    np.testing.assert_allclose(fields["c5"], solver_mat * 2, rtol=1e-6)
+
+    # the saved float32 fields are not handed out as float64
+    fields = proc.get_solver_fields("Cells_200.txt", dtype=np.float64)
+    assert fields["c5"].dtype == np.float64
+    np.testing.assert_allclose(fields["c5"], solver_mat * 2, rtol=1e-12)
+
+
+def test_import_is_lazy():
+    code = (
+        "import sys, lbibhelper, lbibhelper.cli; "
+        "print([m for m in ('matplotlib', 'scipy') if m in sys.modules]); "
+        "print(lbibhelper.curve_fit.__name__, lbibhelper.fit.plt.__name__)"
+    )
+    out = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True)
+    # the old names still resolve, on first access
+    assert out.splitlines() == ["[]", "curve_fit matplotlib.pyplot"]
+
+
+@pytest.mark.parametrize("reduce", REDUCTIONS)
+@pytest.mark.parametrize("axis,band", [(0, None), (1, None), (0, (2, 5)), (1, (1, 3))])
+def test_reduce(tmp_path, solver_mat, reduce, axis, band):
+    cells = tmp_path / "Cells_0.txt"
+    mat = solver_mat - 0.5
+    _write_cells(cells, mat)
+    np.save(tmp_path / "Cells_0.npy", mat)
+
+    sel = slice(*band) if band else slice(None)
+    expected = getattr(np, reduce)(mat[sel] if axis == 0 else mat[:, sel], axis=axis)
+
+    np.testing.assert_allclose(
+        reduce_txt(str(cells), *mat.shape, reduce=reduce, axis=axis, band=band),
+        expected,
+    )
+    np.testing.assert_allclose(
+        reduce_npy(str(tmp_path / "Cells_0.npy"), reduce, axis, band), expected
+    )
+
+
+def test_kymograph(solver_dir, solver_mat):
+    proc = SolverProcessor(str(solver_dir))
+    figname = str(solver_dir / "kymo.png")
+    kymo = proc.kymograph(jobs=2, figname=figname)
+
+    expected = np.mean(solver_mat, axis=0) * np.arange(3)[:, None]
+    np.testing.assert_allclose(kymo, expected)
+    assert os.path.isfile(figname)
+    np.testing.assert_allclose(
+        get_solver_mat(str(solver_dir / "Cells_200.txt"), flatten=True), expected[2]
+    )